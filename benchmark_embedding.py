@@ -0,0 +1,75 @@
+"""
+Benchmark Script: Data-Parallel Embedding Throughput
+
+This script:
+- Embeds the same set of chunk-sized texts with 1, 2, 4, ... worker processes
+- Splits the CPU cores evenly between the workers' ONNX sessions
+- Reports chunks/s, speedup over one session and scaling efficiency
+
+Use the best row to set ODF_EMBED_WORKERS / ODF_EMBED_THREADS on a machine.
+"""
+
+import os        # CPU count
+import sys       # Command line arguments
+import time      # Throughput measurement
+import random    # Reproducible synthetic corpus
+
+from search_engine.embedder import Embedder  # Embedding model wrapper
+from evaluate_metrics import GROUND_TRUTH    # Source sentences for the synthetic corpus
+
+NUM_TEXTS = 2048   # Chunks embedded per configuration
+CHUNK_WORDS = 250  # Roughly the length of a full chunk
+
+
+def build_corpus(num_texts=NUM_TEXTS, chunk_words=CHUNK_WORDS):
+    """Chunk-sized texts (plus some short ones, like filename fallbacks)."""
+    rng = random.Random(42)
+    words = " ".join(list(GROUND_TRUTH.keys()) + list(GROUND_TRUTH.values())).split()
+    texts = []
+    for i in range(num_texts):
+        length = chunk_words if i % 5 else rng.randint(3, 12)
+        texts.append(" ".join(rng.choice(words) for _ in range(length)))
+    return texts
+
+
+def worker_counts(cores):
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def run_benchmark(precision="fp32"):
+    cores = os.cpu_count() or 1
+    texts = build_corpus()
+    print(f"\n🚀 EMBEDDING THROUGHPUT ({len(texts)} chunks, {cores} cores, {precision})")
+
+    rows = []
+    for workers in worker_counts(cores):
+        threads = max(1, cores // workers)
+        embedder = Embedder(precision=precision, workers=workers, threads=threads, verbose=False)
+        try:
+            embedder.embed_texts(texts[:64], use_cache=False)  # Warm-up: start workers, load sessions
+            start = time.perf_counter()
+            embedder.embed_texts(texts, use_cache=False)
+            rate = len(texts) / (time.perf_counter() - start)
+        finally:
+            embedder.close()
+        rows.append((workers, threads, rate))
+        print(f"   {workers:>3} workers x {threads:>3} threads: {rate:8.1f} chunks/s")
+
+    base = rows[0][2]
+    print("\n" + "=" * 60)
+    print(f"{'Workers':>8} | {'Threads':>8} | {'Chunks/s':>10} | {'Speedup':>8} | {'Efficiency':>10}")
+    print("-" * 60)
+    for workers, threads, rate in rows:
+        speedup = rate / base
+        print(f"{workers:>8} | {threads:>8} | {rate:>10.1f} | {speedup:>7.2f}x | {speedup / workers:>9.0%}")
+    print("=" * 60)
+
+
+# Script entry point
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else "fp32")
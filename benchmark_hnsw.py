@@ -0,0 +1,149 @@
+"""
+Benchmark Script: HNSW Parameter Sweep (Chroma)
+
+This script:
+- rebuild: builds one throw-away Chroma index per (M, construction_ef) pair from the
+  current index's vectors (or synthetic ones) and queries each with every search_ef
+- requery: keeps the current index and only sweeps search_ef (no rebuild)
+- Reports recall@10 against exact search, p50/p99 latency and index size
+- Recommends the fastest setting that reaches the target recall; 'apply' saves it
+  to data/index_config.json (search_ef takes effect at once, M and
+  construction_ef when the index is next rebuilt)
+
+Usage: python benchmark_hnsw.py [rebuild|requery] [target_recall] [apply]
+"""
+
+import os        # Path handling
+import sys       # Command line arguments
+import time      # Build time measurement
+import shutil    # Removing previous sweep indexes
+import numpy as np  # Percentiles
+
+from search_engine.index_config import IndexConfig
+from search_engine.vector_store import ChromaStore, directory_size
+from benchmark_vector_store import (  # Same data, queries and recall measurement
+    BATCH, TOP_K, load_index_vectors, synthetic_vectors, make_queries, exact_top_k, measure_queries
+)
+
+DATA_DIR = "data"
+SWEEP_ROOT = os.path.join(DATA_DIR, "hnsw_sweep")
+GRID_M = (8, 16, 32)
+GRID_CONSTRUCTION_EF = (100, 200)
+GRID_SEARCH_EF = (10, 20, 40, 80, 160, 320)
+TARGET_RECALL = 0.95
+
+
+# ==========================================
+# ⏱️ 1. SWEEPS
+# ==========================================
+def sweep_search_ef(store, queries, truth, build_s, size_mb):
+    """Query one index with every search_ef; the store's own setting is restored afterwards."""
+    original = store.hnsw_settings()["search_ef"]
+    settings = store.hnsw_settings()
+    rows = []
+    for search_ef in GRID_SEARCH_EF:
+        store.set_search_ef(search_ef)
+        store.query(queries[0], n_results=TOP_K)  # First query after a change reloads the index
+        latencies, recalls = measure_queries(store, queries, truth)
+        rows.append({
+            "M": settings["M"],
+            "construction_ef": settings["construction_ef"],
+            "search_ef": search_ef,
+            "build_s": build_s,
+            "size_mb": size_mb,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "recall": float(np.mean(recalls)),
+        })
+        print(f"   M={settings['M']:<3} construction_ef={settings['construction_ef']:<4} "
+              f"search_ef={search_ef:<4} recall={rows[-1]['recall']:.3f} p50={rows[-1]['p50_ms']:.2f}ms")
+    store.set_search_ef(original)
+    return rows
+
+
+def rebuild_sweep(vectors, queries, truth):
+    rows = []
+    for m in GRID_M:
+        for construction_ef in GRID_CONSTRUCTION_EF:
+            path = os.path.join(SWEEP_ROOT, f"M{m}_ef{construction_ef}")
+            shutil.rmtree(path, ignore_errors=True)
+            store = ChromaStore(path, hnsw={"M": m, "construction_ef": construction_ef})
+            start = time.perf_counter()
+            for i in range(0, len(vectors), BATCH):
+                part = vectors[i:i + BATCH]
+                ids = [str(j) for j in range(i, i + len(part))]
+                store.upsert(ids, part, [""] * len(part), [{"n": j} for j in range(i, i + len(part))])
+            build_s = time.perf_counter() - start
+            rows.extend(sweep_search_ef(store, queries, truth, build_s, directory_size(path) / 1e6))
+            store.close()
+    return rows
+
+
+def requery_sweep(queries, truth):
+    """search_ef sweep on the application's own Chroma index."""
+    store = ChromaStore(os.path.join(DATA_DIR, "chroma_db"))
+    return sweep_search_ef(store, queries, truth, 0.0, directory_size(store.path) / 1e6)
+
+
+# ==========================================
+# 📊 2. REPORT
+# ==========================================
+def print_table(rows):
+    print("\n" + "=" * 92)
+    print(f"{'M':>4} | {'constr_ef':>9} | {'search_ef':>9} | {f'Recall@{TOP_K}':>9} | {'p50 ms':>7} | "
+          f"{'p99 ms':>7} | {'Build s':>8} | {'Size MB':>8}")
+    print("-" * 92)
+    for r in rows:
+        print(f"{r['M']:>4} | {r['construction_ef']:>9} | {r['search_ef']:>9} | {r['recall']:>9.3f} | "
+              f"{r['p50_ms']:>7.2f} | {r['p99_ms']:>7.2f} | {r['build_s']:>8.1f} | {r['size_mb']:>8.1f}")
+    print("=" * 92)
+
+
+def recommend(rows, target_recall):
+    """Fastest (p50) setting reaching the target recall, else the most accurate one."""
+    good = [r for r in rows if r["recall"] >= target_recall]
+    if good:
+        return min(good, key=lambda r: (r["p50_ms"], r["size_mb"]))
+    print(f"⚠️ No setting reached recall {target_recall:.2f}; using the most accurate one")
+    return max(rows, key=lambda r: (r["recall"], -r["p50_ms"]))
+
+
+def run_sweep(mode="rebuild", target_recall=TARGET_RECALL, apply=False):
+    config = IndexConfig(os.path.join(DATA_DIR, "index_config.json"))
+    if mode == "requery" and config.get("vector_store") != "chroma":
+        print(f"The current index uses the {config.get('vector_store')} store; nothing to re-query.")
+        return
+
+    vectors = load_index_vectors(DATA_DIR)
+    if vectors is None:
+        if mode == "requery":
+            print("The current index is empty; nothing to re-query.")
+            return
+        vectors = synthetic_vectors()
+        print(f"\n📦 Using {len(vectors)} synthetic vectors (no index found)")
+    else:
+        print(f"\n📦 Using {len(vectors)} vectors from the current index")
+    queries = make_queries(vectors)
+    truth = exact_top_k(vectors, queries)
+
+    print(f"\n🔍 HNSW SWEEP ({mode}, target recall@{TOP_K} >= {target_recall:.2f})")
+    rows = rebuild_sweep(vectors, queries, truth) if mode == "rebuild" else requery_sweep(queries, truth)
+    print_table(rows)
+
+    best = recommend(rows, target_recall)
+    print(f"\n✅ Recommended: M={best['M']}, construction_ef={best['construction_ef']}, "
+          f"search_ef={best['search_ef']} (recall {best['recall']:.3f}, p50 {best['p50_ms']:.2f} ms)")
+    if apply:
+        config.set(hnsw_m=best["M"], hnsw_construction_ef=best["construction_ef"],
+                   hnsw_search_ef=best["search_ef"])
+        print("   Saved to the index config (M and construction_ef apply after the next rebuild).")
+
+
+# Script entry point
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_sweep(
+        mode=args[0] if args else "rebuild",
+        target_recall=float(args[1]) if len(args) > 1 else TARGET_RECALL,
+        apply="apply" in args,
+    )
@@ -0,0 +1,178 @@
+"""
+Benchmark Script: Vector Store Backends
+
+This script:
+- Loads the chunk vectors of an existing index (or generates clustered synthetic ones)
+- Writes the same vectors into every vector store backend
+- Measures build time, startup (open + first query), p50/p99 query latency
+- Reports recall@10 against exact search and the disk / search-memory footprint
+- Sweeps query-time settings (IVF-PQ nprobe, binary re-rank depth) on one built store
+
+Use it to pick "vector_store" (and "flat_dtype", "ivf_nprobe", "binary_rerank") in
+data/index_config.json.
+"""
+
+import os        # Path handling
+import sys       # Command line arguments
+import time      # Build, startup and latency measurement
+import shutil    # Removing previous benchmark stores
+import numpy as np  # Vectors, exact ground truth, percentiles
+
+from search_engine.index_config import IndexConfig     # Backend of the existing index
+from search_engine.vector_store import open_vector_store
+
+BENCH_ROOT = os.path.join("data", "store_benchmark")
+NUM_SYNTHETIC = 100000  # Chunks generated when no index exists
+NUM_QUERIES = 200
+TOP_K = 10
+BATCH = 5000            # Vectors per upsert (below Chroma's maximum batch size)
+
+# (label, backend, options)
+BACKENDS = [
+    ("chroma (HNSW)", "chroma", {}),
+    ("flat float32", "flat", {"dtype": "float32"}),
+    ("flat float16", "flat", {"dtype": "float16"}),
+    ("ivf-pq", "ivfpq", {}),
+    ("binary", "binary", {}),
+]
+# Query-time settings swept on one built store: backend -> (attribute, values)
+SWEEPS = {
+    "ivfpq": ("nprobe", (4, 8, 16, 32, 64)),
+    "binary": ("rerank", (100, 300, 1000)),
+}
+
+
+# ==========================================
+# 📦 1. DATA
+# ==========================================
+def load_index_vectors(data_dir="data"):
+    """All chunk vectors of the application's index, or None if it is empty."""
+    config = IndexConfig(os.path.join(data_dir, "index_config.json"))
+    if not config.exists:
+        return None
+    store = open_vector_store(config.get("vector_store"), data_dir, dtype=config.get("flat_dtype"))
+    if store.count() == 0:
+        return None
+    vectors = []
+    offset = 0
+    while True:
+        page = store.get(limit=BATCH, offset=offset, include=["embeddings"])
+        if not len(page["ids"]):
+            break
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    store.close()
+    return np.vstack(vectors)
+
+
+def synthetic_vectors(n=NUM_SYNTHETIC, dim=384, clusters=200, seed=42):
+    """Topic clusters with noise: closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors, n=NUM_QUERIES, seed=7):
+    """Perturbed copies of stored vectors (queries near, but not on, the data)."""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), size=min(n, len(vectors)), replace=False)]
+    queries = picked + 0.3 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(picked.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors, queries, k=TOP_K):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normed.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+# ==========================================
+# ⏱️ 2. MEASUREMENT
+# ==========================================
+def benchmark_backend(label, kind, options, vectors, queries, truth, data_dir):
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    store = open_vector_store(kind, data_dir, **options)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), BATCH):
+        part = vectors[i:i + BATCH]
+        ids = [str(j) for j in range(i, i + len(part))]
+        store.upsert(ids, part, [""] * len(part), [{"n": j} for j in range(i, i + len(part))])
+    if kind == "ivfpq":
+        store.train()  # On the full set, as a steady-state index would be
+    build_s = time.perf_counter() - start
+    store.close()
+    store = None
+
+    # Startup: what the app pays before its first search
+    start = time.perf_counter()
+    store = open_vector_store(kind, data_dir, **options)
+    store.query(queries[0], n_results=TOP_K)
+    startup_s = time.perf_counter() - start
+
+    footprint = store.footprint()
+    settings = [(label, None)]
+    if kind in SWEEPS:
+        attribute, values = SWEEPS[kind]
+        settings = [(f"{label} {attribute}={v}", v) for v in values]
+
+    rows = []
+    for row_label, value in settings:
+        if value is not None:
+            setattr(store, attribute, value)
+        latencies, recalls = measure_queries(store, queries, truth)
+        rows.append({
+            "label": row_label,
+            "build_s": build_s,
+            "startup_s": startup_s,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "recall": float(np.mean(recalls)),
+            "disk_mb": footprint["disk_bytes"] / 1e6,
+            "memory_mb": footprint["memory_bytes"] / 1e6,
+        })
+    store.close()
+    return rows
+
+
+def measure_queries(store, queries, truth):
+    """Per-query latency (ms) and recall@k against the exact top-k."""
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = store.query(q, n_results=TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & {int(i) for i in result["ids"]}) / len(expected))
+    return latencies, recalls
+
+
+def run_benchmark(source="index"):
+    vectors = load_index_vectors() if source == "index" else None
+    if vectors is None:
+        vectors = synthetic_vectors()
+        print(f"\n📦 Using {len(vectors)} synthetic vectors (no index found or 'synthetic' requested)")
+    else:
+        print(f"\n📦 Using {len(vectors)} vectors from the current index")
+    queries = make_queries(vectors)
+    truth = exact_top_k(vectors, queries)
+
+    rows = []
+    for i, (label, kind, options) in enumerate(BACKENDS):
+        print(f"   Benchmarking {label}...")
+        data_dir = os.path.join(BENCH_ROOT, f"{i}_{kind}")
+        rows.extend(benchmark_backend(label, kind, options, vectors, queries, truth, data_dir))
+
+    print("\n" + "=" * 106)
+    print(f"{'Backend':<24} | {'Build s':>8} | {'Startup s':>9} | {'p50 ms':>7} | {'p99 ms':>7} | "
+          f"{f'Recall@{TOP_K}':>9} | {'Disk MB':>8} | {'Memory MB':>9}")
+    print("-" * 106)
+    for r in rows:
+        print(f"{r['label']:<24} | {r['build_s']:>8.1f} | {r['startup_s']:>9.2f} | {r['p50_ms']:>7.2f} | "
+              f"{r['p99_ms']:>7.2f} | {r['recall']:>9.3f} | {r['disk_mb']:>8.1f} | {r['memory_mb']:>9.1f}")
+    print("=" * 106)
+
+
+# Script entry point
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else "index")
@@ -0,0 +1,153 @@
+"""
+Benchmark Script: FP32 vs INT8 Embedding Model
+
+This script:
+- Builds one throw-away index per model precision from the research dataset
+- Runs the 100-query ground truth of evaluate_metrics.py against each index
+- Measures raw embedding throughput of each model on the same chunk texts
+- Prints MRR, Precision@1, Recall@5/10, latency and throughput side by side
+
+Use it to decide whether an index should be built with the int8 model
+(VectorSearch(precision='int8') or "precision" in data/index_config.json).
+"""
+
+import os      # Path handling
+import time    # Throughput and latency measurement
+import shutil  # Removing previous benchmark indexes
+import numpy as np  # MRR computation
+
+from search_engine.vector_search import VectorSearch  # Semantic search engine
+from search_engine.file_indexer import FileIndexer    # Text extraction
+from evaluate_metrics import GROUND_TRUTH             # Same 100 queries as the main evaluation
+
+DATASET_PATH = "Research_Massive_Dataset"
+EVAL_ROOT = os.path.join("data", "quantization_eval")
+THROUGHPUT_SAMPLE = 512  # Chunks embedded for the throughput measurement
+PRECISIONS = ("fp32", "int8")
+
+
+# ==========================================
+# 🏗️ 1. INDEX CONSTRUCTION
+# ==========================================
+def build_index(precision, dataset_path):
+    """
+    Index the dataset into a fresh, separate data folder.
+
+    Args:
+        precision (str): 'fp32' or 'int8'
+        dataset_path (str): Folder with the benchmark documents
+
+    Returns:
+        VectorSearch: Engine backed by the new index
+    """
+    data_dir = os.path.join(EVAL_ROOT, precision)
+    shutil.rmtree(data_dir, ignore_errors=True)  # No cached vectors from earlier runs
+
+    vs = VectorSearch(data_dir=data_dir, precision=precision)
+    indexer = FileIndexer()
+    documents = indexer.process_files(indexer.scan_directory_iter(dataset_path))
+    vs.add_documents(documents)
+    return vs
+
+
+def measure_throughput(vs, texts):
+    """Chunks per second of pure model inference (embedding cache bypassed)."""
+    vs.embedder.embed_texts(texts[:8], use_cache=False)  # Warm-up (session init, allocations)
+    start = time.perf_counter()
+    vs.embedder.embed_texts(texts, use_cache=False)
+    return len(texts) / (time.perf_counter() - start)
+
+
+# ==========================================
+# 🎯 2. RETRIEVAL QUALITY
+# ==========================================
+def score(vs):
+    """
+    Run every ground-truth query and compute ranking metrics.
+
+    Returns:
+        dict: mrr, p1, r5, r10 (percent) and latency (sec/query)
+    """
+    reciprocal_ranks = []
+    hits = {1: 0, 5: 0, 10: 0}
+
+    start = time.time()
+    for query, expected_keyword in GROUND_TRUTH.items():
+        results = vs.search(query, top_k=10)
+
+        rank = -1
+        for i, res in enumerate(results):
+            if expected_keyword.lower() in res['metadata']['filename'].lower():
+                rank = i + 1
+                break
+
+        reciprocal_ranks.append(1.0 / rank if rank != -1 else 0.0)
+        for k in hits:
+            if rank != -1 and rank <= k:
+                hits[k] += 1
+
+    total = len(GROUND_TRUTH)
+    return {
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p1": hits[1] / total * 100,
+        "r5": hits[5] / total * 100,
+        "r10": hits[10] / total * 100,
+        "latency": (time.time() - start) / total,
+    }
+
+
+# ==========================================
+# 📊 3. REPORT
+# ==========================================
+def run_benchmark(dataset_path=DATASET_PATH):
+    if not os.path.isdir(dataset_path):
+        print(f"⚠️ Dataset folder '{dataset_path}' not found.")
+        return
+
+    results = {}
+    sample = None
+    for precision in PRECISIONS:
+        print(f"\n🚀 BUILDING {precision.upper()} INDEX...")
+        vs = build_index(precision, dataset_path)
+        if vs.embedder.precision != precision:
+            print(f"❌ {precision} model could not be loaded, skipping.")
+            continue
+
+        if sample is None:
+            # Both models embed exactly the same chunk texts
+            sample = vs.store.get(limit=THROUGHPUT_SAMPLE, include=["documents"])["documents"]
+
+        metrics = score(vs)
+        metrics["throughput"] = measure_throughput(vs, sample) if sample else 0.0
+        results[precision] = metrics
+
+    if len(results) < 2:
+        return
+
+    fp32, int8 = results["fp32"], results["int8"]
+    rows = [
+        ("MRR", "mrr", "{:.4f}"),
+        ("Precision@1 (%)", "p1", "{:.1f}"),
+        ("Recall@5 (%)", "r5", "{:.1f}"),
+        ("Recall@10 (%)", "r10", "{:.1f}"),
+        ("Avg Latency (s/query)", "latency", "{:.4f}"),
+        ("Embedding (chunks/s)", "throughput", "{:.1f}"),
+    ]
+
+    print("\n" + "=" * 64)
+    print("📊 FP32 vs INT8 EMBEDDING MODEL")
+    print("=" * 64)
+    print(f"{'Metric':<24} | {'FP32':>10} | {'INT8':>10} | {'Change':>10}")
+    print("-" * 64)
+    for label, key, fmt in rows:
+        if key in ("throughput", "latency"):
+            change = f"{int8[key] / fp32[key]:.2f}x" if fp32[key] else "-"
+        else:
+            change = f"{int8[key] - fp32[key]:+.4f}" if key == "mrr" else f"{int8[key] - fp32[key]:+.1f}"
+        print(f"{label:<24} | {fmt.format(fp32[key]):>10} | {fmt.format(int8[key]):>10} | {change:>10}")
+    print("=" * 64)
+
+
+# Script entry point
+if __name__ == "__main__":
+    run_benchmark()
@@ -8,6 +8,7 @@ Main entry point for the application.
 import os
 import sys
 import threading
+import multiprocessing
 from ui.search_window import SearchWindow  # Main UI window for search functionality
 
 import keyboard  # Used for registering global hotkeys
@@ -84,4 +85,6 @@ def main():
 # (Not when imported as a module)
 # ------------------------------------------------------------
 if __name__ == "__main__":
+    # Required for the extraction process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Binary-Quantized Vector Store
+FlatStore plus one sign bit per dimension for every chunk (48 bytes for a
+384-dim bge-small vector, 32x less than float32). A query first ranks all chunks
+by Hamming distance between sign codes, then re-scores the best few hundred with
+the full-precision vectors, which stay in the memory-mapped file on disk.
+"""
+
+import os
+import numpy as np
+
+from search_engine.vector_store import FlatStore
+
+# Set bits of every 16-bit value (NumPy < 2.0 has no vectorized popcount)
+_POPCOUNT16 = np.unpackbits(np.arange(1 << 16, dtype=np.uint16).view(np.uint8)).reshape(-1, 16).sum(
+    axis=1, dtype=np.uint8)
+
+
+def pack_signs(vectors):
+    """(n, dim) floats -> (n, dim / 8) uint8 sign bits."""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def hamming_distances(codes, query_code):
+    """Differing bits between every row of codes and query_code (both packed uint8)."""
+    codes = np.ascontiguousarray(codes)
+    # Widest word that divides the code: fewer XORs and popcounts per row
+    word = np.uint64 if codes.shape[1] % 8 == 0 else np.uint16 if codes.shape[1] % 2 == 0 else np.uint8
+    diff = codes.view(word) ^ np.ascontiguousarray(query_code).view(word)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(diff).sum(axis=1, dtype=np.uint16)
+    if word == np.uint8:
+        return _POPCOUNT16[diff].sum(axis=1, dtype=np.uint16)
+    return _POPCOUNT16[diff.view(np.uint16)].sum(axis=1, dtype=np.uint16)
+
+
+class BinaryStore(FlatStore):
+    """FlatStore files plus codes.bin: dim / 8 sign-bit bytes per row (memory-mapped)."""
+    name = "binary"
+    # Rows compared per Hamming block (keeps the XOR result in cache)
+    SCAN_BLOCK = 32768
+
+    def __init__(self, path, dtype="float32", rerank=300):
+        """
+        Args:
+            path (str): Folder of the store
+            dtype (str): Precision of the full vectors used for re-ranking
+            rerank (int): Hamming candidates re-scored with full vectors
+        """
+        self.rerank = rerank
+        self.codes_path = os.path.join(path, 'codes.bin')
+        self._codes = None
+        super().__init__(path, dtype=dtype)
+        if self.dim is not None:
+            self._map_codes()
+
+    def _map_codes(self):
+        """Map the code file at the vector file's capacity; re-encode if it is out of step."""
+        self._codes = None
+        code_bytes = (self.dim + 7) // 8
+        expected = self.capacity * code_bytes
+        size = os.path.getsize(self.codes_path) if os.path.exists(self.codes_path) else 0
+        stale = size < min(expected, self._high * code_bytes)
+        with open(self.codes_path, 'ab') as f:
+            f.truncate(expected)
+        self._codes = np.memmap(self.codes_path, dtype=np.uint8, mode='r+', shape=(self.capacity, code_bytes))
+        if stale and self._high:
+            print("Binary store: rebuilding sign codes")
+            for start in range(0, self._high, self.SCAN_BLOCK):
+                end = min(start + self.SCAN_BLOCK, self._high)
+                self._codes[start:end] = pack_signs(self._vectors[start:end])
+            self._codes.flush()
+
+    def _resize(self, capacity):
+        super()._resize(capacity)
+        self._map_codes()
+
+    def _after_write(self, rows, vectors):
+        self._codes[rows] = pack_signs(vectors)
+        self._codes.flush()
+
+    def reset(self):
+        with self._lock:
+            self._codes = None
+            if os.path.exists(self.codes_path):
+                os.remove(self.codes_path)
+            return super().reset()
+
+    def query(self, embedding, n_results=10, where=None):
+        with self._lock:
+            if where or self._vectors is None or self._high == 0:
+                # Filtered queries score the (usually small) matching set exactly
+                return super().query(embedding, n_results, where)
+
+            q = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+            query_code = pack_signs(q)
+            distances = np.empty(self._high, dtype=np.uint16)
+            for start in range(0, self._high, self.SCAN_BLOCK):
+                end = min(start + self.SCAN_BLOCK, self._high)
+                distances[start:end] = hamming_distances(self._codes[start:end], query_code)
+            live = self._live[:self._high]
+            distances[~live] = np.iinfo(np.uint16).max
+
+            valid = int(live.sum())
+            shortlist = min(max(self.rerank, n_results), valid)
+            if shortlist <= 0:
+                return self._result([], [])
+            return self._rerank(q, np.argpartition(distances, shortlist - 1)[:shortlist], n_results)
+
+    def footprint(self):
+        report = super().footprint()
+        with self._lock:
+            # Scanned data: sign codes and live flags (re-ranking reads a few hundred vectors)
+            report["memory_bytes"] = self._high * ((self.dim or 0) + 7) // 8 + self.capacity
+        return report
@@ -0,0 +1,173 @@
+"""
+Text Chunker
+Splits document text into overlapping chunks at natural boundaries. Works on whole
+strings or incrementally on a stream of (page_number, text) segments.
+TokenChunker sizes chunks with the embedding model's own tokenizer.
+"""
+
+import statistics
+
+
+class TextChunker:
+    SEPARATORS = ['\n\n', '\n', '. ', ' ']
+
+    def __init__(self, chunk_size=1000, chunk_overlap=100):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.chunk_counts = []
+
+    def _tail_fits(self, text, start):
+        """True if text[start:] can be emitted as the final chunk."""
+        return len(text) - start <= self.chunk_size
+
+    def _next_cut(self, text, start):
+        """
+        Find where the chunk starting at `start` ends and where the next one begins.
+        Only looks at text[start:start + chunk_size], so the result does not depend
+        on text that has not arrived yet.
+        """
+        end = start + self.chunk_size
+        for sep in self.SEPARATORS:
+            idx = text.rfind(sep, start, end)
+            if idx != -1 and idx > start + (self.chunk_size // 2):
+                break_point = idx + len(sep)
+                return break_point, break_point - self.chunk_overlap
+        return end, end - self.chunk_overlap
+
+    def split(self, text):
+        """Split a complete string into chunks."""
+        if not text:
+            return []
+        chunks = []
+        start = 0
+        text_len = len(text)
+        while start < text_len:
+            if self._tail_fits(text, start):
+                chunks.append(text[start:])
+                break
+            cut, start_next = self._next_cut(text, start)
+            chunks.append(text[start:cut])
+            start = start_next
+        return chunks
+
+    def split_segments(self, segments):
+        """
+        Incrementally chunk a stream of (page_number, text) segments. Chunks may span
+        pages; only the unfinished tail of the text is kept in memory.
+
+        Yields:
+            (chunk_text, page_start, page_end)
+        """
+        buffer = ""
+        # (offset in buffer, page number) where each page's text begins
+        marks = []
+
+        def page_at(pos):
+            page = marks[0][1]
+            for offset, p in marks:
+                if offset > pos:
+                    break
+                page = p
+            return page
+
+        for page, text in segments:
+            if not text:
+                continue
+            if buffer:
+                buffer += " "
+            marks.append((len(buffer), page))
+            buffer += text
+
+            # Cut while a full window is available (same cuts as split())
+            while len(buffer) > self.chunk_size:
+                cut, start_next = self._next_cut(buffer, 0)
+                yield buffer[:cut], page_at(0), page_at(cut - 1)
+
+                active = page_at(start_next)
+                buffer = buffer[start_next:]
+                marks = [(0, active)] + [(o - start_next, p) for o, p in marks if o > start_next]
+
+        while buffer and not self._tail_fits(buffer, 0):
+            cut, start_next = self._next_cut(buffer, 0)
+            yield buffer[:cut], page_at(0), page_at(cut - 1)
+            active = page_at(start_next)
+            buffer = buffer[start_next:]
+            marks = [(0, active)] + [(o - start_next, p) for o, p in marks if o > start_next]
+
+        if buffer:
+            yield buffer, page_at(0), page_at(len(buffer) - 1)
+
+    # -------------------- STATS --------------------
+    def record_document(self, chunk_count):
+        self.chunk_counts.append(chunk_count)
+
+    def reset_stats(self):
+        self.chunk_counts = []
+
+    def chunk_distribution(self):
+        """Chunks-per-document distribution of the documents recorded so far."""
+        counts = sorted(self.chunk_counts)
+        if not counts:
+            return {"documents": 0, "chunks": 0}
+        return {
+            "documents": len(counts),
+            "chunks": sum(counts),
+            "mean": statistics.mean(counts),
+            "median": statistics.median(counts),
+            "p90": counts[min(len(counts) - 1, int(len(counts) * 0.9))],
+            "max": counts[-1],
+        }
+
+
+class TokenChunker(TextChunker):
+    def __init__(self, tokenizer, max_tokens=510, overlap_tokens=50, max_chars_per_token=10):
+        """
+        Fill each chunk up to `max_tokens` model tokens, still cutting at separators.
+
+        Args:
+            tokenizer: `tokenizers.Tokenizer` of the embedding model (truncation disabled)
+            max_tokens (int): Token budget per chunk, excluding special tokens
+            overlap_tokens (int): Tokens repeated at the start of the next chunk
+            max_chars_per_token (int): Bounds the character window tokenized per cut
+        """
+        super().__init__(chunk_size=max_tokens * max_chars_per_token, chunk_overlap=0)
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def _offsets(self, text):
+        return self.tokenizer.encode(text, add_special_tokens=False).offsets
+
+    def _tail_fits(self, text, start):
+        if len(text) - start > self.chunk_size:
+            return False
+        return len(self._offsets(text[start:])) <= self.max_tokens
+
+    def _next_cut(self, text, start):
+        """
+        Same contract as TextChunker._next_cut, but the window ends at the last whole
+        token within the budget and the overlap is measured in tokens.
+        """
+        window = text[start:start + self.chunk_size]
+        offsets = self._offsets(window)
+        if len(offsets) > self.max_tokens:
+            limit = offsets[self.max_tokens - 1][1]
+        else:
+            limit = len(window)
+
+        cut = limit
+        for sep in self.SEPARATORS:
+            idx = window.rfind(sep, 0, limit)
+            if idx != -1 and idx > limit // 2:
+                cut = idx + len(sep)
+                break
+
+        # Step back `overlap_tokens` whole tokens from the cut
+        inside = [o for o in offsets if o[1] <= cut]
+        if len(inside) > self.overlap_tokens:
+            next_start = inside[len(inside) - self.overlap_tokens][0] if self.overlap_tokens else cut
+        else:
+            next_start = cut
+        if next_start <= 0:
+            next_start = cut
+        return start + cut, start + next_start
@@ -4,7 +4,10 @@ Handles text embedding using FastEmbed for high-performance semantic search.
 """
 
 import os
+import re
 import sys
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 import numpy as np
 from fastembed import TextEmbedding
@@ -16,12 +19,76 @@ except ImportError:
     ort = None
 
 
+PRECISIONS = ('fp32', 'int8')
+
+
+def quantize_model(source_dir, model_file, target_dir):
+    """ 
+    Produce an int8 copy of an ONNX embedding model with dynamic quantization 
+    (weights stored as int8, activations quantized on the fly). Tokenizer and 
+    config files are copied alongside. Needs the `onnx` package. 
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(target_dir, exist_ok=True)
+    for name in os.listdir(source_dir):
+        if name.endswith(('.json', '.txt')):
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(target_dir, name))
+
+    target = os.path.join(target_dir, 'model.onnx')
+    tmp_target = os.path.join(target_dir, 'model.tmp.onnx')
+    quantize_dynamic(os.path.join(source_dir, model_file), tmp_target, weight_type=QuantType.QInt8)
+    os.replace(tmp_target, target)
+    return target
+
+
+def _env_int(name):
+    value = os.environ.get(name, "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+# -------------------- EMBEDDING WORKER PROCESSES --------------------
+# Each worker holds its own ONNX session; set up once per process by the pool initializer
+_worker_embedder = None
+
+
+def _init_embed_worker(model_name, precision, threads):
+    global _worker_embedder
+    _worker_embedder = Embedder(model_name, precision=precision, threads=threads, workers=1, verbose=False)
+
+
+def _embed_in_worker(texts):
+    return np.array(list(_worker_embedder.model.embed(texts, batch_size=len(texts))))
+
+
 class Embedder:
-    def __init__(self, model_name='BAAI/bge-small-en-v1.5'):
+    def __init__(self, model_name='BAAI/bge-small-en-v1.5', cache=None, precision='fp32',
+                 workers=None, threads=None, verbose=True):
         """ 
         Initialize the embedder with FastEmbed. 
+        `cache` is an optional EmbeddingCache consulted before running the model. 
+        `precision='int8'` runs a locally quantized copy of the model (CPU only). 
+        `workers` > 1 embeds batches in parallel worker processes, each with its own 
+        session of `threads` intra-op threads (defaults: ODF_EMBED_WORKERS / 
+        ODF_EMBED_THREADS environment variables, else one session using all cores). 
         """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
         self.model_name = model_name
+        self.precision = precision
+        self.cache = cache
+
+        # --- 0. PARALLELISM (per machine) --- 
+        self.workers = workers or _env_int("ODF_EMBED_WORKERS") or 1
+        self.threads = threads or _env_int("ODF_EMBED_THREADS")
+        if self.workers > 1 and self.threads is None:
+            # Split the cores between the sessions instead of oversubscribing them 
+            self.threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = None
+
+        # Tokenizer used only to measure text lengths for batching (loaded on first use) 
+        self._length_tokenizer = None
+        self._max_length = 512
 
         # --- 1. SETUP CACHE & PATHS --- 
         if getattr(sys, 'frozen', False):
@@ -34,31 +101,72 @@ class Embedder:
         if not os.path.exists(model_cache_dir) and not getattr(sys, 'frozen', False):
             os.makedirs(model_cache_dir)
 
-        print(f"Loading embedding model: {model_name}")
+        if verbose:
+            print(f"Loading embedding model: {model_name}")
 
         # --- 2. LOAD MODEL (Auto-Fallback Logic) --- 
-        try:
-            # Try loading with GPU (CUDA) first 
-            self.model = TextEmbedding(
-                model_name=model_name,
-                threads=None,
-                cache_dir=model_cache_dir,
-                local_files_only=False,
-                providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
-            )
-        except Exception as e:
-            # If GPU fails (ValueError), fall back to CPU 
-            print(f" GPU Initialization failed: {e}")
-            print(" Falling back to CPU Mode...")
-            self.model = TextEmbedding(
-                model_name=model_name,
-                threads=None,
-                cache_dir=model_cache_dir,
-                local_files_only=False,
-                providers=["CPUExecutionProvider"]
+        self.model = None
+        if precision == 'int8':
+            try:
+                self.model = self._load_quantized(model_cache_dir)
+            except Exception as e:
+                print(f" INT8 model unavailable ({e}), using fp32")
+                self.precision = 'fp32'
+
+        if self.model is None:
+            try:
+                # Try loading with GPU (CUDA) first 
+                self.model = TextEmbedding(
+                    model_name=model_name,
+                    threads=self.threads,
+                    cache_dir=model_cache_dir,
+                    local_files_only=False,
+                    providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
+                )
+            except Exception as e:
+                # If GPU fails (ValueError), fall back to CPU 
+                print(f" GPU Initialization failed: {e}")
+                print(" Falling back to CPU Mode...")
+                self.model = TextEmbedding(
+                    model_name=model_name,
+                    threads=self.threads,
+                    cache_dir=model_cache_dir,
+                    local_files_only=False,
+                    providers=["CPUExecutionProvider"]
+                )
+
+            # --- 3. ROBUST GPU CHECK --- 
+            if verbose:
+                self._print_device_status()
+
+        if self.workers > 1:
+            # Sessions are loaded by the workers themselves; the local model stays for 
+            # single queries, which are not worth a process round trip 
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_embed_worker,
+                initargs=(model_name, self.precision, self.threads),
             )
+            if verbose:
+                print(f" Data-parallel embedding: {self.workers} processes x {self.threads} threads")
+
+        if verbose:
+            print(f"Model '{self.model_id}' loaded successfully!")
 
-        # --- 3. ROBUST GPU CHECK --- 
+    @staticmethod
+    def _fp32_model_dir(description, model_cache_dir):
+        """Folder of the fp32 model files in FastEmbed's Hugging Face cache (downloaded if missing)."""
+        from huggingface_hub import snapshot_download
+
+        repo_id = description["sources"]["hf"]
+        patterns = ["*.json", "*.txt", description["model_file"], *description.get("additional_files", [])]
+        try:
+            return snapshot_download(repo_id=repo_id, cache_dir=model_cache_dir, allow_patterns=patterns,
+                                     local_files_only=True)
+        except Exception:
+            return snapshot_download(repo_id=repo_id, cache_dir=model_cache_dir, allow_patterns=patterns)
+
+    def _print_device_status(self):
         print("-" * 40)
         if ort:
             available_providers = ort.get_available_providers()
@@ -76,35 +184,176 @@ class Embedder:
         else:
             print(" GPU Check: Could not import onnxruntime to verify.")
         print("-" * 40)
-        # ------------------------------------- 
 
-        print(f"Model '{model_name}' loaded successfully!")
+    @property
+    def model_id(self):
+        """Name of the exact model variant (vectors of different variants must not be mixed)."""
+        return self.model_name if self.precision == 'fp32' else f"{self.model_name}-{self.precision}"
+
+    def _load_quantized(self, model_cache_dir):
+        """ 
+        Load the int8 copy of the model as a custom FastEmbed model. On first use it 
+        is quantized from the fp32 files in the model cache; no fp32 session is created. 
+        """
+        from fastembed.common.model_description import PoolingType, ModelSource
+
+        description = next(m for m in TextEmbedding.list_supported_models() if m["model"] == self.model_name)
 
-    def embed_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
-        """Generate embeddings for multiple texts."""
+        # The bundled models folder is read-only in the frozen app 
+        quant_root = model_cache_dir
+        if getattr(sys, 'frozen', False):
+            quant_root = os.path.join(os.path.dirname(sys.executable), 'models')
+        quant_dir = os.path.join(quant_root, 'int8', re.sub(r'[^A-Za-z0-9_.-]', '_', self.model_name))
+        if not os.path.exists(os.path.join(quant_dir, 'model.onnx')):
+            print(f"Quantizing {self.model_name} to int8 (one-time)...")
+            source_dir = self._fp32_model_dir(description, model_cache_dir)
+            quantize_model(source_dir, description["model_file"], quant_dir)
+        model_cache_dir = quant_root
+
+        if not any(m["model"] == self.model_id for m in TextEmbedding.list_supported_models()):
+            # BGE models embed with the [CLS] token and L2-normalized output 
+            TextEmbedding.add_custom_model(
+                model=self.model_id,
+                pooling=PoolingType.CLS,
+                normalization=True,
+                sources=ModelSource(hf=description["sources"]["hf"]),
+                dim=description["dim"],
+                model_file="model.onnx",
+            )
+
+        # Dynamically quantized ops only have CPU kernels 
+        return TextEmbedding(
+            model_name=self.model_id,
+            threads=self.threads,
+            cache_dir=model_cache_dir,
+            providers=["CPUExecutionProvider"],
+            specific_model_path=quant_dir,
+        )
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Token count of each text as the model will see it (capped at its sequence length)."""
+        if self._length_tokenizer is None:
+            self._length_tokenizer, self._max_length = self.get_tokenizer()
+            if self._length_tokenizer is None:
+                self._length_tokenizer = False
+            else:
+                # Text past the model limit is cut anyway; don't spend time tokenizing it 
+                self._length_tokenizer.enable_truncation(self._max_length)
+        if not self._length_tokenizer:
+            # Rough fallback: ~4 characters per token 
+            return [min(512, len(t) // 4 + 2) for t in texts]
+        encodings = self._length_tokenizer.encode_batch(texts)
+        return [len(e.ids) for e in encodings]
+
+    def _embed_bucketed(self, texts: List[str], batch_size: int, token_budget: int) -> List[np.ndarray]:
+        """ 
+        Embed texts in batches of similar length. Every text in a batch is padded to the 
+        longest one, so texts are sorted by token length and a batch is closed once 
+        (items x longest length) would exceed `token_budget`. Results keep input order. 
+        """
+        if len(texts) == 1:
+            return list(self.model.embed(texts, batch_size=1))
+
+        lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+        if self._pool is not None:
+            # Enough batches to keep every worker busy 
+            batch_size = min(batch_size, max(1, -(-len(texts) // self.workers)))
+
+        batches = []
+        current = []
+        for i in order:
+            # Sorted ascending, so the newest text is the longest in the batch 
+            if current and (len(current) >= batch_size or (len(current) + 1) * lengths[i] > token_budget):
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+
+        if self._pool is not None:
+            # map() yields in submission order, so results are reassembled in place 
+            outputs = self._pool.map(_embed_in_worker, [[texts[i] for i in batch] for batch in batches])
+        else:
+            outputs = (self.model.embed([texts[i] for i in batch], batch_size=len(batch)) for batch in batches)
+
+        results = [None] * len(texts)
+        for batch, vectors in zip(batches, outputs):
+            for i, vector in zip(batch, vectors):
+                results[i] = vector
+        return results
+
+    def embed_texts(self, texts: List[str], batch_size: int = 256, use_cache: bool = True,
+                    token_budget: int = 16384) -> np.ndarray:
+        """ 
+        Generate embeddings for multiple texts (cached vectors are reused without inference). 
+        Batches are sized by `token_budget` padded tokens, at most `batch_size` texts each. 
+        """
         if not texts:
             return np.array([])
 
+        cached = self.cache.get_many(texts) if (self.cache is not None and use_cache) else {}
+        if len(cached) == len(texts):
+            return np.array([cached[i] for i in range(len(texts))])
+
         try:
-            embeddings_generator = self.model.embed(texts, batch_size=batch_size)
-            embeddings_list = list(embeddings_generator)
-            return np.array(embeddings_list)
+            missing = [i for i in range(len(texts)) if i not in cached]
+            embeddings_list = self._embed_bucketed([texts[i] for i in missing], batch_size, token_budget)
         except Exception as e:
             print(f"Error embedding texts: {e}")
             return np.array([])
 
+        if self.cache is not None and use_cache:
+            try:
+                self.cache.put_many([texts[i] for i in missing], embeddings_list)
+            except Exception as e:
+                print(f"Embedding cache write failed: {e}")
+
+        if not cached:
+            return np.array(embeddings_list)
+        cached.update(zip(missing, embeddings_list))
+        return np.array([cached[i] for i in range(len(texts))])
+
     def embed_text(self, text: str) -> np.ndarray:
         """Generate embedding for a single text."""
         if not text:
             return np.array([])
 
-        embeddings = self.embed_texts([text])
+        # Queries are not worth a disk slot 
+        embeddings = self.embed_texts([text], use_cache=False)
         if len(embeddings) > 0:
             return embeddings[0]
         return np.array([])
 
+    def close(self):
+        """Stop the embedding worker processes, if any."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_tokenizer(self):
+        """ 
+        Copy of the model's tokenizer with truncation and padding disabled, for 
+        token-budget chunking. Returns (tokenizer, max_sequence_length) or (None, None). 
+        """
+        try:
+            from tokenizers import Tokenizer
+            source = self.model.model.tokenizer
+            max_length = (source.truncation or {}).get("max_length", 512)
+            tokenizer = Tokenizer.from_str(source.to_str())
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            return tokenizer, max_length
+        except Exception as e:
+            print(f"Tokenizer unavailable, chunking by characters: {e}")
+            return None, None
+
     def get_embedding_dimension(self) -> int:
-        """Get the dimension of the embedding vectors."""
+        """Get the dimension of the embedding vectors (from the model registry, no inference)."""
+        for description in TextEmbedding.list_supported_models():
+            if description["model"] in (self.model_id, self.model_name):
+                return description["dim"]
         try:
             dummy_emb = self.embed_text("test")
             if len(dummy_emb) > 0:
@@ -113,6 +362,10 @@ class Embedder:
             pass
         return 384  # Default fallback for bge-small 
 
+    def warm_up(self):
+        """One tiny inference so session setup and memory allocation happen before the first query."""
+        self.embed_texts(["warm up"], use_cache=False)
+
     def get_model_info(self) -> dict:
         return {
             "model_name": self.model_name,
@@ -0,0 +1,255 @@
+"""
+Embedding Cache
+Disk-backed cache of chunk embeddings keyed by (model name, normalized text hash).
+Vectors live in a memory-mapped float32 array; a small SQLite index maps keys to
+rows and tracks recency for size-bounded LRU eviction.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, model_name, max_entries=200000, initial_capacity=4096):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Folder holding the vector file and its index
+            model_name (str): Embedding model; vectors of different models never mix
+            max_entries (int): Upper bound on cached vectors (least recently used are evicted)
+            initial_capacity (int): Rows allocated up front; the file grows by doubling
+        """
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.cache_dir = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.initial_capacity = min(initial_capacity, max_entries)
+        self.vectors_path = os.path.join(self.cache_dir, 'vectors.f32')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Slot reuse relies on evictions reaching disk before the vectors do (one fsync per batch) 
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+
+        self.dim = None
+        self.capacity = 0
+        self._vectors = None
+        self._high = 0    # one past the highest slot ever handed out
+        self._free = []   # unused slots below _high (refilled by eviction)
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row and os.path.exists(self.vectors_path):
+            self._open(int(row[0]))
+        else:
+            # Index without its vector file (or vice versa) is useless
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    # -------------------- KEYS & STORAGE --------------------
+    def key(self, text):
+        normalized = _WHITESPACE.sub(' ', text).strip()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.model_name.encode('utf-8'))
+        h.update(b'\0')
+        h.update(normalized.encode('utf-8', errors='ignore'))
+        return h.hexdigest()
+
+    def _open(self, dim):
+        self.dim = dim
+        row_bytes = dim * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        self.capacity = size // row_bytes
+        if self.capacity == 0:
+            self._resize(self.initial_capacity)
+        else:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                      shape=(self.capacity, dim))
+        # One scan at open; afterwards the free list is maintained incrementally
+        used = np.fromiter((s for (s,) in self._conn.execute("SELECT slot FROM entries")), dtype=np.int64)
+        used = used[used < self.capacity]
+        self._high = int(used.max()) + 1 if len(used) else 0
+        taken = np.zeros(self._high, dtype=bool)
+        taken[used] = True
+        self._free = np.flatnonzero(~taken).tolist()
+
+    def _resize(self, capacity):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(capacity, self.dim))
+
+    def _init_dim(self, dim):
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+        self._conn.execute("DELETE FROM entries")
+        self._conn.commit()
+        if os.path.exists(self.vectors_path):
+            os.remove(self.vectors_path)
+        self._vectors = None
+        self._high = 0
+        self._free = []
+        self.dim = dim
+        self._resize(self.initial_capacity)
+
+    def _free_slots(self, needed, keep=()):
+        """Return `needed` unused rows, growing the file or evicting LRU entries (never `keep`)."""
+        free = self._free[-needed:] if needed else []
+        del self._free[len(self._free) - len(free):]
+
+        missing = needed - len(free)
+        if missing and self._high < self.max_entries:
+            end = min(self._high + missing, self.max_entries)
+            if end > self.capacity:
+                capacity = self.capacity
+                while capacity < end:
+                    capacity *= 2
+                self._resize(min(capacity, self.max_entries))
+            free.extend(range(self._high, end))
+            self._high = end
+
+        if len(free) < needed:
+            # Evict a little more than required so eviction is not paid on every batch
+            count = max(needed - len(free), self.max_entries // 20)
+            victims = self._conn.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (count + len(keep),)
+            ).fetchall()
+            victims = [(k, s) for k, s in victims if k not in keep][:count]
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            # Durable before the slots are overwritten: a crash or power loss in between 
+            # must not leave the evicted keys pointing at other texts' vectors 
+            self._conn.commit()
+            self.evictions += len(victims)
+            slots = [s for _, s in victims]
+            taken = needed - len(free)
+            free.extend(slots[:taken])
+            self._free.extend(slots[taken:])
+        return free
+
+    # -------------------- PUBLIC API --------------------
+    def get_many(self, texts):
+        """
+        Look up cached vectors.
+
+        Returns:
+            dict: index in `texts` -> vector, for every hit
+        """
+        if not texts:
+            return {}
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self._lock:
+            if self._vectors is not None:
+                unique = list(set(keys))
+                for i in range(0, len(unique), 500):
+                    part = unique[i:i + 500]
+                    placeholders = ",".join("?" * len(part))
+                    found.update(self._conn.execute(
+                        f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", part
+                    ).fetchall())
+                if found:
+                    now = time.time()
+                    self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                           [(now, k) for k in found])
+                    self._conn.commit()
+
+            result = {i: np.array(self._vectors[found[k]]) for i, k in enumerate(keys) if k in found}
+            self.hits += len(result)
+            self.misses += len(texts) - len(result)
+        return result
+
+    def put_many(self, texts, vectors):
+        """Store vectors for texts; keys already cached only have their recency refreshed."""
+        if not texts or len(vectors) != len(texts):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        entries = {}
+        for t, v in zip(texts, vectors):
+            entries[self.key(t)] = v
+
+        with self._lock:
+            if self.dim != vectors.shape[1]:
+                self._init_dim(vectors.shape[1])
+
+            keys = list(entries)
+            existing = {}
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                existing.update(self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", part
+                ).fetchall())
+
+            new_keys = [k for k in keys if k not in existing][:self.max_entries - len(existing)]
+            slots = dict(zip(new_keys, self._free_slots(len(new_keys), keep=set(existing))))
+
+            for k, slot in slots.items():
+                self._vectors[slot] = entries[k]
+            self._vectors.flush()
+
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(k, slot, now) for k, slot in slots.items()]
+            )
+            self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                   [(now, k) for k in existing])
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "capacity": self.capacity,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_mb": (self.capacity * (self.dim or 0) * 4) / (1024 * 1024),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._free = list(range(self._high))
+            self.hits = self.misses = self.evictions = 0
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._conn.close()
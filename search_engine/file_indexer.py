@@ -7,17 +7,66 @@ import os
 import hashlib
 import re
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
 from docx import Document
 import fitz
 
+from search_engine.manifest import ManifestReader
+
 # Suppress annoying PDFMiner warnings 
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
 
+# Pages parsed per extraction task: a PDF in flight holds at most two groups of page text 
+PDF_PAGE_GROUP = 32
+
+_WHITESPACE = re.compile(r'\s+')
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+
+
+def clean_text(text, max_chars=100000):
+    if not text:
+        return ""
+    # Remove excessive whitespace 
+    text = _WHITESPACE.sub(' ', text)
+    # Remove null bytes and non-printable control chars 
+    text = _CONTROL_CHARS.sub('', text)
+    text = text.strip()
+    return text[:max_chars] if max_chars else text
+
+
+# Indexer instance owned by each extraction worker process 
+_worker_indexer = None
+
+
+def _init_worker(indexer):
+    """Process pool initializer: ship the indexer once per worker, not per file."""
+    global _worker_indexer
+    _worker_indexer = indexer
+
+
+def _extract_in_worker(file_path, file_stats=None):
+    return _worker_indexer._process_single_path_independent(file_path, file_stats)
+
+
+def _extract_pages_in_worker(file_path, start, count):
+    return _worker_indexer._extract_pdf_pages(file_path, start, count)
+
+
 class FileIndexer:
-    def __init__(self):
-        """Initialize the file indexer."""
+    def __init__(self, extraction_mode='auto', keep_pools=False):
+        """ 
+        Initialize the file indexer. 
+         
+        Args: 
+            extraction_mode (str): 'threads', 'processes' or 'auto' (processes for 
+                CPU-bound formats, threads for the rest) 
+            keep_pools (bool): Reuse the extraction pools across process_files calls 
+                (for many small runs, e.g. watcher batches) until close() 
+        """
         # 1. ADDED .exe HERE 
         self.supported_extensions = {'.pdf', '.docx', '.txt', '.exe'}
 
@@ -32,56 +81,310 @@ class FileIndexer:
             'C:\\RECOVERY'
         }
 
+        # --- EXTRACTION BACKEND --- 
+        self.extraction_mode = extraction_mode
+        cpu_count = os.cpu_count() or 1
+        self.thread_workers = min(32, cpu_count * 4)
+        self.process_workers = min(61, cpu_count)  # 61 is the Windows process pool limit 
+
+        if extraction_mode == 'threads':
+            self.process_extensions = set()
+        elif extraction_mode == 'processes':
+            self.process_extensions = set(self.supported_extensions)
+        else:
+            # PyMuPDF page text, python-docx tree walking and the EXE byte regex hold the GIL 
+            self.process_extensions = {'.pdf', '.docx', '.exe'}
+
+        self.last_stats = {}
+
+        self.keep_pools = keep_pools
+        self._pools = None
+        self._pools_key = None
+
+        # Looks up document IDs (content hashes) already embedded; matching files are not 
+        # re-extracted. Set per run from the manifest; pickles as a path for process workers 
+        self.manifest_reader = None
+
+        # True once the last scan_directory_iter walk listed every folder and was read to 
+        # the end; only such a scan proves that files it did not find are gone 
+        self.last_scan_complete = False
+
+    def __getstate__(self):
+        # Shipped to the worker processes; the pools stay with the parent 
+        state = self.__dict__.copy()
+        state["_pools"] = None
+        return state
+
+    def close(self):
+        """Shut down the pools kept by keep_pools."""
+        if self._pools is not None:
+            thread_pool, process_pool = self._pools
+            self._pools = None
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+            if process_pool is not None:
+                process_pool.shutdown(wait=False, cancel_futures=True)
+
     def scan_directory(self, folder_path):
         """Scans the folder and returns a list of supported files."""
-        if not os.path.exists(folder_path):
-            raise ValueError(f"Folder does not exist: {folder_path}")
-
-        all_files = []
-        for root, dirs, files in os.walk(folder_path):
-            # Filter directories in-place 
-            dirs[:] = [d for d in dirs if not self._should_skip_folder(os.path.join(root, d))]
-
-            for file in files:
-                _, ext = os.path.splitext(file.lower())
-                if ext in self.supported_extensions:
-                    all_files.append(os.path.join(root, file))
-
+        all_files = [path for path, _ in self.scan_directory_iter(folder_path)]
         print(f"Found {len(all_files)} supported files to scan.")
         return all_files
 
-    def process_files(self, file_paths, existing_ids=None):
-        """Process a list of files in parallel and yield documents."""
-        if existing_ids is None:
-            existing_ids = set()
+    def scan_directory_iter(self, folder_path, max_workers=8, queue_size=10000):
+        """ 
+        Streaming parallel scan. Subtrees are walked concurrently with os.scandir and 
+        (path, stat_result) pairs are yielded as soon as they are found, so indexing 
+        starts before the walk finishes. DirEntry stat results are reused (free on 
+        Windows, one stat per file elsewhere). Sets last_scan_complete when the walk ends. 
+        """
+        self.last_scan_complete = False
+        if not os.path.exists(folder_path):
+            raise ValueError(f"Folder does not exist: {folder_path}")
 
-        print(f"Processing {len(file_paths)} files with {len(existing_ids)} existing IDs...")
+        out = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        lock = threading.Lock()
+        outstanding = [0]
+        failed = threading.Event()  # some folder or entry could not be read
+        done = object()
 
-        files_to_process = []
-        skipped_count = 0
+        def put(item):
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.2)
+                    return
+                except queue.Full:
+                    continue
 
-        for f in file_paths:
+        def submit(folder):
+            with lock:
+                outstanding[0] += 1
             try:
-                # Pre-calculate ID to check if we can skip 
-                file_stats = os.stat(f)
-                doc_id = hashlib.md5(f"{f}_{file_stats.st_mtime}".encode()).hexdigest()
+                executor.submit(walk, folder)
+            except RuntimeError:
+                finish()  # executor already shut down
+
+        def finish():
+            with lock:
+                outstanding[0] -= 1
+                last = outstanding[0] == 0
+            if last:
+                put(done)
+
+        def walk(folder):
+            try:
+                subdirs = []
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if stop.is_set():
+                            return
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not self._should_skip_folder(entry.path):
+                                    subdirs.append(entry.path)
+                            elif entry.is_file():
+                                _, ext = os.path.splitext(entry.name.lower())
+                                if ext in self.supported_extensions:
+                                    put((entry.path, entry.stat()))
+                        except OSError:
+                            failed.set()
+                            continue
+                for sub in subdirs:
+                    submit(sub)
+            except OSError:
+                failed.set()
+            finally:
+                finish()
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        submit(folder_path)
+        try:
+            while True:
+                item = out.get()
+                if item is done:
+                    self.last_scan_complete = not failed.is_set()
+                    return
+                yield item
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def process_files(self, file_paths, manifest=None, scheduler=None):
+        """ 
+        Process files in parallel and yield documents. 
+         
+        Args: 
+            file_paths (iterable): Paths, or (path, stat_result) pairs (e.g. straight from 
+                scan_directory_iter). Consumed lazily, so it may be a stream. 
+            manifest (FileManifest): If given, files unchanged since the last index are skipped 
+            scheduler (IndexScheduler): If given, changed files are extracted in priority order 
+        """
+        self.scan_counts = {"seen": 0, "skipped": 0}
+
+        if manifest is not None:
+            self.manifest_reader = ManifestReader(manifest.db_path)
+            files_to_process = manifest.iter_changed(file_paths, self.scan_counts)
+        else:
+            self.manifest_reader = None
+            files_to_process = self._with_stats(file_paths)
+
+        if scheduler is not None:
+            files_to_process = scheduler.order(files_to_process)
+
+        stats = {"files": 0, "bytes": 0, "cpu": 0.0}
+        started = time.perf_counter()
+
+        if self.keep_pools:
+            thread_pool, process_pool = self._kept_pools()
+        else:
+            thread_pool, process_pool = self._create_pools()
+        finished = False
+        try:
+            def in_process(f):
+                _, ext = os.path.splitext(f.lower())
+                return process_pool is not None and ext in self.process_extensions
 
-                if doc_id in existing_ids:
-                    skipped_count += 1
-                    continue
+            def submit(item):
+                f, file_stats = item
+                if in_process(f):
+                    return process_pool.submit(_extract_in_worker, f, file_stats)
+                return thread_pool.submit(self._process_single_path_independent, f, file_stats)
 
-                files_to_process.append(f)
-            except:
+            def submit_pages(f, start):
+                try:
+                    if in_process(f):
+                        return process_pool.submit(_extract_pages_in_worker, f, start, PDF_PAGE_GROUP)
+                    return thread_pool.submit(self._extract_pdf_pages, f, start, PDF_PAGE_GROUP)
+                except RuntimeError:
+                    # The pools shut down once the file stream ends; parse the tail here 
+                    future = Future()
+                    future.set_result(self._extract_pdf_pages(f, start, PDF_PAGE_GROUP))
+                    return future
+
+            # Keep a bounded number of files in flight so extracted text does not
+            # pile up in memory when the downstream pipeline is slower 
+            max_in_flight = (self.thread_workers + self.process_workers) * 2
+            for result in self._run_bounded(submit, files_to_process, max_in_flight):
+                stats["files"] += 1
+                stats["bytes"] += result["metadata"].get("size", 0)
+                stats["cpu"] += result.pop("extract_cpu", 0.0)
+                page_count = result.pop("page_count", 0)
+                if page_count > PDF_PAGE_GROUP:
+                    result["segments"] = self._stream_pages(
+                        result["metadata"]["source"], result["segments"], page_count, submit_pages
+                    )
+                yield result
+            finished = True
+        finally:
+            if not self.keep_pools:
+                thread_pool.shutdown(wait=False, cancel_futures=True)
+                if process_pool is not None:
+                    process_pool.shutdown(wait=False, cancel_futures=True)
+            elif not finished:
+                # Aborted, or a worker died and broke the pool: start fresh next run 
+                self.close()
+            print(f"Skipped {self.scan_counts['skipped']} of {self.scan_counts['seen']} files (already indexed).")
+            self._report_throughput(stats, time.perf_counter() - started)
+
+    def _stream_pages(self, file_path, first_pages, page_count, submit_pages):
+        """ 
+        Yield a long PDF's pages group by group. The first group comes with the file's 
+        result; each later group is parsed by the pools one group ahead of the chunker. 
+        """
+        yield from first_pages
+        start = PDF_PAGE_GROUP
+        pending = submit_pages(file_path, start)
+        while pending is not None:
+            try:
+                pages, _ = pending.result()
+            except Exception:
+                # Cancelled (or the worker died) when the pools shut down; parse it here 
+                pages, _ = self._extract_pdf_pages(file_path, start, PDF_PAGE_GROUP)
+            start += PDF_PAGE_GROUP
+            pending = submit_pages(file_path, start) if start < page_count else None
+            yield from pages
+
+    def _with_stats(self, file_paths):
+        for item in file_paths:
+            self.scan_counts["seen"] += 1
+            if isinstance(item, tuple):
+                yield item
+                continue
+            try:
+                yield item, os.stat(item)
+            except OSError:
                 continue
 
-        print(f"Skipping {skipped_count} already indexed files. Processing {len(files_to_process)} new/modified files.")
-
-        # ThreadPoolExecutor is best for I/O bound tasks like file reading 
-        max_workers = min(32, (os.cpu_count() or 1) * 4)
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_file = {executor.submit(self._process_single_path_independent, f): f for f in files_to_process}
+    def _create_pools(self):
+        """ 
+        Threads handle I/O-bound formats (TXT). 
+        Processes handle CPU-bound parsing (PDF, DOCX, EXE) that would otherwise 
+        be serialized by the GIL. 
+        """
+        thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers)
+        process_pool = None
 
-            for future in as_completed(future_to_file):
+        if self.extraction_mode == 'processes' or (
+                self.extraction_mode == 'auto' and self.process_extensions):
+            try:
+                process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    initializer=_init_worker,
+                    initargs=(self,)
+                )
+            except Exception as e:
+                print(f" Process pool unavailable, extracting with threads only: {e}")
+
+        return thread_pool, process_pool
+
+    def _kept_pools(self):
+        """Pools reused across runs. Workers hold the indexer they were started with, so a 
+        different manifest needs new ones."""
+        key = self.manifest_reader.db_path if self.manifest_reader is not None else None
+        if self._pools is not None and self._pools_key != key:
+            self.close()
+        if self._pools is None:
+            self._pools = self._create_pools()
+            self._pools_key = key
+        return self._pools
+
+    def _report_throughput(self, stats, elapsed):
+        """Print extraction throughput, overall and per busy core."""
+        if not stats["files"] or elapsed <= 0:
+            self.last_stats = {}
+            return
+
+        cores_busy = stats["cpu"] / elapsed
+        per_core = stats["files"] / stats["cpu"] if stats["cpu"] > 0 else 0.0
+
+        self.last_stats = {
+            "files": stats["files"],
+            "seconds": elapsed,
+            "files_per_sec": stats["files"] / elapsed,
+            "mb_per_sec": stats["bytes"] / elapsed / (1024 * 1024),
+            "cores_busy": cores_busy,
+            "files_per_sec_per_core": per_core,
+        }
+        print(f"Extracted {stats['files']} files in {elapsed:.1f}s "
+              f"({self.last_stats['files_per_sec']:.1f} files/s, {self.last_stats['mb_per_sec']:.1f} MB/s) | "
+              f"{cores_busy:.1f} cores busy, {per_core:.1f} files/s per core")
+
+    def _run_bounded(self, submit, file_paths, max_in_flight):
+        """Submit files lazily, never holding more than max_in_flight pending results."""
+        pending = set()
+        paths = iter(file_paths)
+
+        while True:
+            for f in paths:
+                pending.add(submit(f))
+                if len(pending) >= max_in_flight:
+                    break
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
                 try:
                     result = future.result()
                     if result:
@@ -89,40 +392,80 @@ class FileIndexer:
                 except Exception:
                     pass
 
-    def _process_single_path_independent(self, file_path):
-        """Process a single file: extract text and metadata."""
+    def _process_single_path_independent(self, file_path, file_stats=None):
+        """ 
+        Process a single file: extract text and metadata. Results are picklable. 
+        Files whose bytes are already indexed come back as references without content. 
+        """
         try:
+            cpu_start = time.thread_time()
             _, ext = os.path.splitext(file_path.lower())
 
-            content = self._extract_content(file_path, ext)
-
-            if not content or not content.strip():
-                # If content is empty, use filename as content so it's still searchable 
-                content = os.path.basename(file_path)
+            if file_stats is None:
+                file_stats = os.stat(file_path)
 
-            file_stats = os.stat(file_path)
-            doc_id = hashlib.md5(f"{file_path}_{file_stats.st_mtime}".encode()).hexdigest()
+            # Content-addressed ID: identical bytes at different paths share chunks 
+            content_hash = self._hash_file(file_path)
+            if content_hash and file_stats.st_size > 0:
+                doc_id = content_hash
+            else:
+                # Empty files fall back to their filename as content, so keep them per path 
+                doc_id = hashlib.md5(f"{file_path}_{file_stats.st_mtime}".encode()).hexdigest()
 
-            return {
+            result = {
                 "id": doc_id,
-                "content": content,
+                "content": None,
                 "metadata": {
                     "source": file_path,
                     "filename": os.path.basename(file_path),
                     "modified": file_stats.st_mtime,
                     "size": file_stats.st_size,
                     "type": ext
-                }
+                },
+                "file_state": {
+                    "size": file_stats.st_size,
+                    "mtime_ns": file_stats.st_mtime_ns,
+                    "inode": file_stats.st_ino
+                },
+                "content_hash": content_hash,
+                "duplicate": self.manifest_reader is not None and self.manifest_reader.has_document(doc_id)
             }
+
+            if not result["duplicate"] and ext == '.pdf':
+                # Page text is parsed here, in the worker, one group of pages at a time; the 
+                # chunker consumes it page by page, so long PDFs are indexed in full without 
+                # a joined string or cap 
+                result["segments"], result["page_count"] = self._extract_pdf_pages(
+                    file_path, 0, PDF_PAGE_GROUP
+                )
+            elif not result["duplicate"]:
+                content = self._extract_content(file_path, ext)
+
+                if not content or not content.strip():
+                    # If content is empty, use filename as content so it's still searchable 
+                    content = os.path.basename(file_path)
+                result["content"] = content
+
+            result["extract_cpu"] = time.thread_time() - cpu_start
+            return result
         except Exception:
             return None
 
+    def _hash_file(self, file_path, block_size=1024 * 1024):
+        """Streaming BLAKE2b hash of the file bytes (constant memory)."""
+        try:
+            h = hashlib.blake2b(digest_size=16)
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(block_size), b''):
+                    h.update(block)
+            return h.hexdigest()
+        except OSError:
+            return None
+
     def _extract_content(self, file_path, extension):
         """Extract text content from a file based on its extension."""
         if extension == '.txt':
             return self._extract_txt_content(file_path)
-        elif extension == '.pdf':
-            return self._extract_pdf_content(file_path)
         elif extension == '.docx':
             return self._extract_docx_content(file_path)
         elif extension == '.exe':
@@ -161,20 +504,27 @@ class FileIndexer:
                 continue
         return ""
 
-    def _extract_pdf_content(self, file_path):
+    def _extract_pdf_pages(self, file_path, start=0, count=None):
         """ 
-        Extracts text from PDF using PyMuPDF (Fitz). 
-        This is 20x faster than PDFMiner. 
+        Extracts text from PDF pages using PyMuPDF (Fitz). 
+
+        Returns: 
+            tuple: ([(page_number, text)] for the non-empty pages among `count` pages 
+                from index `start`, total page count) 
         """
+        pages = []
+        page_count = 0
         try:
-            text_content = []
             with fitz.open(file_path) as doc:
-                for page in doc:
-                    text_content.append(page.get_text())
-
-            return self._clean_text("\n".join(text_content))
-        except Exception:
-            return ""
+                page_count = doc.page_count
+                stop = page_count if count is None else min(page_count, start + count)
+                for index in range(start, stop):
+                    text = clean_text(doc[index].get_text(), max_chars=None)
+                    if text:
+                        pages.append((index + 1, text))
+        except Exception as e:
+            print(f"Error reading PDF {file_path}: {e}")
+        return pages, page_count
 
     def _extract_docx_content(self, file_path):
         try:
@@ -191,13 +541,24 @@ class FileIndexer:
             return ""
 
     def _clean_text(self, text):
-        if not text:
-            return ""
-        # Remove excessive whitespace 
-        text = re.sub(r'\s+', ' ', text)
-        # Remove null bytes and non-printable control chars 
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
-        return text.strip()[:100000]
+        return clean_text(text)
+
+    def is_indexable(self, file_path, root=None):
+        """ 
+        True if the file has a supported extension and no folder between it and 
+        root (the indexed folder) would be skipped by scan_directory. 
+        """
+        _, ext = os.path.splitext(file_path.lower())
+        if ext not in self.supported_extensions:
+            return False
+
+        stop = os.path.normpath(root) if root else None
+        folder = os.path.dirname(file_path)
+        while folder and folder != stop and os.path.dirname(folder) != folder:
+            if self._should_skip_folder(folder):
+                return False
+            folder = os.path.dirname(folder)
+        return True
 
     def _should_skip_folder(self, folder_path):
         if not folder_path:
@@ -0,0 +1,197 @@
+"""
+Filename Index
+In-memory trigram index over indexed file names and their folders. Answers
+substring and fuzzy filename queries in milliseconds, without the embedding model.
+
+Layout (compact for millions of files):
+- every file has an integer id; its lowercased name and a folder id
+- name trigram -> sorted array of file ids
+- folders are stored once: folder trigram -> folder ids, folder id -> file ids
+"""
+
+import os
+import threading
+from array import array
+from collections import defaultdict
+import numpy as np
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FilenameIndex:
+    # Posting lists larger than this are skipped when scoring fuzzy matches
+    FUZZY_MAX_POSTINGS = 50000
+    # Rebuild once this share of ids belongs to removed files
+    COMPACT_RATIO = 0.3
+    # Substring matches ranked per query
+    MAX_VERIFY = 500
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self._paths = []                 # file id -> path (None once removed)
+        self._names = []                 # file id -> lowercased file name
+        self._ids = {}                   # path -> file id
+        self._name_postings = defaultdict(lambda: array('I'))
+
+        self._dirs = []                  # folder id -> lowercased folder path
+        self._dir_ids = {}
+        self._dir_files = []             # folder id -> list of file ids
+        self._dir_postings = defaultdict(lambda: array('I'))
+
+        self._removed = 0
+
+    # -------------------- UPDATES --------------------
+    def build(self, path_batches):
+        """Load paths (an iterable of lists, e.g. FileManifest.iter_paths()) and mark the index ready."""
+        try:
+            for batch in path_batches:
+                self.add(batch)
+        finally:
+            self.ready.set()
+
+    def add(self, paths):
+        with self._lock:
+            for path in paths:
+                if path in self._ids:
+                    continue
+                folder, name = os.path.split(path)
+                folder_lower = folder.lower()
+                dir_id = self._dir_ids.get(folder_lower)
+                if dir_id is None:
+                    dir_id = len(self._dirs)
+                    self._dir_ids[folder_lower] = dir_id
+                    self._dirs.append(folder_lower)
+                    self._dir_files.append([])
+                    for t in trigrams(folder_lower):
+                        self._dir_postings[t].append(dir_id)
+
+                file_id = len(self._paths)
+                name_lower = name.lower()
+                self._ids[path] = file_id
+                self._paths.append(path)
+                self._names.append(name_lower)
+                self._dir_files[dir_id].append(file_id)
+                for t in trigrams(name_lower):
+                    self._name_postings[t].append(file_id)
+
+    def remove(self, paths):
+        with self._lock:
+            for path in paths:
+                file_id = self._ids.pop(path, None)
+                if file_id is not None:
+                    self._paths[file_id] = None
+                    self._removed += 1
+            if self._paths and self._removed > len(self._paths) * self.COMPACT_RATIO:
+                self._compact()
+
+    def _compact(self):
+        live = [p for p in self._paths if p is not None]
+        self._reset()
+        self.add(live)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def __len__(self):
+        return len(self._ids)
+
+    # -------------------- QUERIES --------------------
+    @staticmethod
+    def _intersect(postings):
+        """Ids present in every posting list (each sorted ascending)."""
+        postings = sorted(postings, key=len)
+        result = np.frombuffer(postings[0], dtype=np.uint32) if len(postings[0]) else np.empty(0, np.uint32)
+        for p in postings[1:]:
+            if len(result) == 0:
+                break
+            other = np.frombuffer(p, dtype=np.uint32)
+            pos = np.searchsorted(other, result)
+            pos[pos == len(other)] = 0
+            result = result[other[pos] == result]
+        return result
+
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Substring matches in file names, then in folder paths, then (optionally) fuzzy
+        name matches sharing most of the query's trigrams.
+
+        Returns:
+            list: (path, score, match) with match in 'name', 'folder', 'fuzzy'
+        """
+        q = query.lower().strip()
+        grams = trigrams(q)
+        if not grams:
+            return []
+
+        results = []
+        seen = set()
+
+        with self._lock:
+            # 1. Query is part of the file name
+            name_lists = [self._name_postings.get(t) for t in grams]
+            if all(name_lists):
+                smallest = min(name_lists, key=len)
+                if len(smallest) > self.MAX_VERIFY * 4:
+                    # Very common fragment: intersecting huge lists costs more than checking
+                    # names directly; rank the first MAX_VERIFY real matches
+                    candidates = smallest
+                else:
+                    candidates = self._intersect(name_lists).tolist()
+                hits = []
+                for file_id in candidates:
+                    if len(hits) >= self.MAX_VERIFY:
+                        break
+                    name = self._names[file_id]
+                    if self._paths[file_id] is not None and q in name:
+                        # Exact name, then prefix, then shorter names first
+                        rank = (0 if name == q or name.rsplit('.', 1)[0] == q else 1 if name.startswith(q) else 2,
+                                len(name))
+                        hits.append((rank, file_id))
+                hits.sort()
+                for rank, file_id in hits[:limit]:
+                    seen.add(file_id)
+                    results.append((self._paths[file_id], 1.0 - 0.05 * rank[0], 'name'))
+
+            # 2. Query is part of a folder path
+            if len(results) < limit:
+                dir_lists = [self._dir_postings.get(t) for t in grams]
+                if all(dir_lists):
+                    for dir_id in self._intersect(dir_lists).tolist():
+                        if q not in self._dirs[dir_id]:
+                            continue
+                        for file_id in self._dir_files[dir_id]:
+                            if file_id not in seen and self._paths[file_id] is not None:
+                                seen.add(file_id)
+                                results.append((self._paths[file_id], 0.8, 'folder'))
+                                if len(results) >= limit:
+                                    break
+                        if len(results) >= limit:
+                            break
+
+            # 3. Typos and partial words: names sharing most query trigrams
+            if fuzzy and len(results) < limit and len(grams) >= 2:
+                lists = [np.frombuffer(p, dtype=np.uint32) for p in name_lists
+                         if p and len(p) <= self.FUZZY_MAX_POSTINGS]
+                if lists:
+                    ids, counts = np.unique(np.concatenate(lists), return_counts=True)
+                    min_shared = max(2, -(-len(grams) * 3 // 5))  # ceil(60%)
+                    keep = counts >= min_shared
+                    ids, counts = ids[keep], counts[keep]
+                    for i in np.argsort(-counts, kind='stable').tolist():
+                        file_id = int(ids[i])
+                        if file_id in seen or self._paths[file_id] is None:
+                            continue
+                        seen.add(file_id)
+                        score = 0.7 * counts[i] / len(grams)
+                        results.append((self._paths[file_id], float(score), 'fuzzy'))
+                        if len(results) >= limit:
+                            break
+
+        return results[:limit]
@@ -0,0 +1,58 @@
+"""
+Index Configuration
+Settings that belong to one index rather than to the application: every vector in
+an index must come from the same embedding model variant, so the choice is stored
+next to the data (data/index_config.json).
+"""
+
+import os
+import json
+
+
+class IndexConfig:
+    DEFAULTS = {
+        "precision": "fp32",
+        # 'chroma' (HNSW), 'flat' (exact, memory-mapped), 'ivfpq' or 'binary'; see vector_store.py
+        "vector_store": "chroma",
+        # Chroma HNSW graph: links per node and build-time candidate list (fixed once the
+        # collection exists), query-time candidate list (adjustable any time)
+        "hnsw_m": 16,
+        "hnsw_construction_ef": 100,
+        "hnsw_search_ef": 100,
+        # Vector precision of a flat store: 'float32' or 'float16' (half the memory)
+        "flat_dtype": "float32",
+        # IVF-PQ: clusters scanned per query, code bytes per vector, exactly re-ranked candidates
+        "ivf_nprobe": 16,
+        "ivf_pq_m": 48,
+        "ivf_rerank": 256,
+        # Binary store: Hamming candidates re-scored with full vectors
+        "binary_rerank": 300,
+        # False until every chunk of the collection is in the lexical (BM25) index
+        "lexical_index_complete": False,
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self.exists = os.path.exists(path)
+        self.values = dict(self.DEFAULTS)
+        if self.exists:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.values.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Could not read index config {path}: {e}")
+
+    def get(self, key):
+        return self.values.get(key, self.DEFAULTS.get(key))
+
+    def set(self, **values):
+        self.values.update(values)
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.values, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.exists = True
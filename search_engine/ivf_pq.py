@@ -0,0 +1,385 @@
+"""
+IVF-PQ Vector Store
+Approximate search for corpora of millions of chunks, in pure NumPy.
+
+- Inverted file (IVF): k-means splits the vectors into `nlist` clusters; a query
+  only scans the `nprobe` clusters whose centroids are closest.
+- Product quantization (PQ): each vector's residual to its centroid is cut into
+  `pq_m` sub-vectors, each stored as the 1-byte id of its nearest sub-centroid.
+  A 384-dim vector costs pq_m bytes (48 by default) instead of 1536.
+- Re-ranking: the best `rerank` candidates by PQ score are re-scored exactly with
+  the full vectors, which stay in the memory-mapped file on disk.
+
+Both quantizers are trained with k-means on a sample of the stored vectors, once
+TRAIN_MIN chunks exist; until then the store answers exactly, like FlatStore.
+Training runs in a background thread without holding the store lock: queries and
+writes keep using the previous model (or exact search) until the new one is
+swapped in.
+"""
+
+import os
+import time
+import threading
+from array import array
+import numpy as np
+
+from search_engine.vector_store import FlatStore
+
+
+def nearest_centroids(x, centroids, block=8192):
+    """Index of the closest centroid (squared L2) for every row of x."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), block):
+        part = np.asarray(x[start:start + block], dtype=np.float32)
+        labels[start:start + len(part)] = np.argmin(c_norms - 2.0 * (part @ centroids.T), axis=1)
+    return labels
+
+
+def kmeans(x, k, iterations=15, seed=0):
+    """
+    Lloyd's k-means.
+
+    Returns:
+        np.ndarray: (k, dim) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        labels = nearest_centroids(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind='stable')
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(x[order], starts, axis=0) / counts[filled, None]
+        # Empty clusters restart on random points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty))]
+    return centroids
+
+
+def pq_encode(vectors, centroids, codebooks):
+    """
+    Returns:
+        (labels, codes): nearest centroid of every vector and its (n, pq_m) uint8 PQ code
+    """
+    labels = nearest_centroids(vectors, centroids)
+    residuals = vectors - centroids[labels]
+    pq_m = len(codebooks)
+    sub = vectors.shape[1] // pq_m
+    codes = np.empty((len(vectors), pq_m), dtype=np.uint8)
+    for i in range(pq_m):
+        codes[:, i] = nearest_centroids(residuals[:, i * sub:(i + 1) * sub], codebooks[i])
+    return labels, codes
+
+
+def inverted_lists(labels, rows, nlist):
+    """Inverted lists (cluster -> rows as array('I')) for the given rows."""
+    order = rows[np.argsort(labels[rows], kind='stable')].astype(np.uint32)
+    bounds = np.searchsorted(labels[order], np.arange(nlist + 1))
+    lists = []
+    for i in range(nlist):
+        posting = array('I')
+        posting.frombytes(order[bounds[i]:bounds[i + 1]].tobytes())
+        lists.append(posting)
+    return lists
+
+
+class IVFPQStore(FlatStore):
+    """
+    FlatStore files plus (in `path`):
+    - ivfpq.npz: coarse centroids and PQ codebooks
+    - codes.u8:  pq_m code bytes per row (memory-mapped)
+    - lists.i32: cluster of every row (memory-mapped; inverted lists are rebuilt from it)
+    """
+    name = "ivfpq"
+    # Chunks stored before the quantizers are trained (exact search until then)
+    TRAIN_MIN = 20000
+    # Retrain once the store has grown this much since the last training
+    RETRAIN_GROWTH = 8
+    # Vectors sampled per centroid for coarse training (and upper bound on the sample)
+    SAMPLES_PER_LIST = 40
+    MAX_TRAIN_SAMPLE = 200000
+    MAX_NLIST = 4096
+    # Rows encoded per block while (re)building codes
+    ENCODE_BLOCK = 16384
+
+    def __init__(self, path, dtype="float32", nprobe=16, pq_m=48, rerank=256, nlist=None):
+        """
+        Args:
+            path (str): Folder of the store
+            dtype (str): Precision of the full vectors used for re-ranking
+            nprobe (int): Clusters scanned per query (recall vs. latency)
+            pq_m (int): Code bytes per vector; must divide the dimension
+            rerank (int): Candidates re-scored with full vectors
+            nlist (int): Number of clusters; None picks about sqrt(chunks)
+        """
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.rerank = rerank
+        self.nlist = nlist
+        self.model_path = os.path.join(path, 'ivfpq.npz')
+        self.codes_path = os.path.join(path, 'codes.u8')
+        self.assign_path = os.path.join(path, 'lists.i32')
+        self._train_lock = threading.Lock()  # one training at a time
+        self._trainer = None                 # background training thread
+        self._generation = 0                 # bumped by reset/close; a running training is dropped
+        self._written = None                 # rows written while a training runs
+        self._clear_model()
+        super().__init__(path, dtype=dtype)
+        if self.dim is not None and os.path.exists(self.model_path):
+            self._load_model()
+
+    # -------------------- MODEL --------------------
+    def _clear_model(self):
+        self.centroids = None        # (nlist, dim)
+        self.codebooks = None        # (pq_m, 256, dim / pq_m)
+        self.trained_count = 0
+        self._codes = None
+        self._assign = None
+        self._lists = []
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def _load_model(self):
+        model = np.load(self.model_path)
+        self.centroids = model["centroids"]
+        self.codebooks = model["codebooks"]
+        self.trained_count = int(model["trained_count"])
+        self.pq_m = self.codebooks.shape[0]
+        self._map_codes()
+        self._build_lists()
+
+    def _map_codes(self):
+        """Map the code files, sized to the vector file's capacity (new rows: no cluster)."""
+        self._codes = self._assign = None
+        old_rows = os.path.getsize(self.assign_path) // 4 if os.path.exists(self.assign_path) else 0
+        for file_path, row_bytes in ((self.codes_path, self.pq_m), (self.assign_path, 4)):
+            with open(file_path, 'ab') as f:
+                f.truncate(self.capacity * row_bytes)
+        self._codes = np.memmap(self.codes_path, dtype=np.uint8, mode='r+', shape=(self.capacity, self.pq_m))
+        self._assign = np.memmap(self.assign_path, dtype=np.int32, mode='r+', shape=(self.capacity,))
+        if old_rows < self.capacity:
+            self._assign[old_rows:] = -1
+
+    def _build_lists(self):
+        """
+        Inverted lists (cluster -> rows) from the per-row cluster file. Deleted rows keep
+        their posting (queries skip them) so a reused row finds it where _encode expects.
+        """
+        labels = np.asarray(self._assign[:self._high])
+        rows = np.flatnonzero(labels >= 0)
+        self._lists = inverted_lists(labels, rows, len(self.centroids))
+
+    def _resize(self, capacity):
+        super()._resize(capacity)
+        if self.trained:
+            self._map_codes()
+
+    def _subspaces(self, dim):
+        """Largest code size <= pq_m that splits the dimension evenly."""
+        m = min(self.pq_m, dim)
+        while dim % m:
+            m -= 1
+        return m
+
+    def train(self, nlist=None):
+        """
+        (Re)train both quantizers on a sample of the stored vectors and re-encode
+        every row, then swap the new model in. Runs in the caller's thread (writes
+        start it in a background thread); the store lock is only held to read
+        vector blocks and for the final swap, so queries are served meanwhile.
+        """
+        with self._train_lock:
+            return self._train(nlist)
+
+    def _train(self, nlist):
+        with self._lock:
+            live = np.flatnonzero(self._live[:self._high])
+            if len(live) < 256:
+                print("IVF-PQ: too few vectors to train")
+                return False
+            generation = self._generation
+            dim = self.dim
+            # Rows written from now on are re-encoded with the new model at the swap
+            self._written = []
+
+        start = time.perf_counter()
+        nlist = nlist or self.nlist or int(np.clip(np.sqrt(len(live)), 16, self.MAX_NLIST))
+        nlist = min(nlist, len(live) // 8)
+        sample_size = min(len(live), max(nlist * self.SAMPLES_PER_LIST, 65536), self.MAX_TRAIN_SAMPLE)
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(live, size=sample_size, replace=False))
+        sample = self._read_rows(sample_rows, generation)
+        if sample is None:
+            return False
+
+        centroids = kmeans(sample, nlist)
+        residuals = sample - centroids[nearest_centroids(sample, centroids)]
+        m = self._subspaces(dim)
+        sub = dim // m
+        pq_sample = residuals[:65536]
+        codebooks = np.stack([
+            kmeans(pq_sample[:, i * sub:(i + 1) * sub], 256, iterations=10, seed=i) for i in range(m)
+        ])
+        del sample, residuals, pq_sample
+
+        # Encode the snapshot into new files beside the ones queries are using
+        high = int(live[-1]) + 1
+        codes = np.memmap(self.codes_path + '.tmp', dtype=np.uint8, mode='w+', shape=(high, m))
+        labels = np.memmap(self.assign_path + '.tmp', dtype=np.int32, mode='w+', shape=(high,))
+        labels[:] = -1
+        for i in range(0, len(live), self.ENCODE_BLOCK):
+            rows = live[i:i + self.ENCODE_BLOCK]
+            vectors = self._read_rows(rows, generation)
+            if vectors is None:
+                del codes, labels
+                self._discard_training()
+                return False
+            labels[rows], codes[rows] = pq_encode(vectors, centroids, codebooks)
+        codes.flush()
+        labels.flush()
+        lists = inverted_lists(np.asarray(labels), live, nlist)
+        del codes, labels
+        np.savez(self.model_path + '.tmp.npz', centroids=centroids, codebooks=codebooks, trained_count=len(live))
+
+        with self._lock:
+            if self._generation != generation:
+                self._discard_training()
+                return False
+            self._codes = self._assign = None
+            os.replace(self.codes_path + '.tmp', self.codes_path)
+            os.replace(self.assign_path + '.tmp', self.assign_path)
+            os.replace(self.model_path + '.tmp.npz', self.model_path)
+            self.centroids, self.codebooks, self.pq_m = centroids, codebooks, m
+            self.trained_count = len(live)
+            self._lists = lists
+            self._map_codes()  # grows the files to the current capacity
+
+            written = np.unique(np.asarray(self._written, dtype=np.int64))
+            self._written = None
+            written = written[self._live[written]]
+            for i in range(0, len(written), self.ENCODE_BLOCK):
+                rows = written[i:i + self.ENCODE_BLOCK]
+                self._encode(rows, np.asarray(self._vectors[rows], dtype=np.float32))
+            self._codes.flush()
+            self._assign.flush()
+        print(f"IVF-PQ trained on {sample_size} of {len(live)} vectors: {nlist} lists, "
+              f"{m} bytes/vector ({time.perf_counter() - start:.1f}s)")
+        return True
+
+    def _read_rows(self, rows, generation, block=ENCODE_BLOCK):
+        """Full vectors of rows, read a block at a time under the lock; None if the store was reset."""
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for i in range(0, len(rows), block):
+            with self._lock:
+                if self._generation != generation:
+                    return None
+                out[i:i + block] = self._vectors[rows[i:i + block]]
+        return out
+
+    def _discard_training(self):
+        with self._lock:
+            self._written = None
+        for file_path in (self.codes_path + '.tmp', self.assign_path + '.tmp', self.model_path + '.tmp.npz'):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _start_training(self, reason):
+        """Train in a background thread, unless one is already running."""
+        if self._trainer is not None and self._trainer.is_alive():
+            return
+        print(reason)
+        self._trainer = threading.Thread(target=self.train, name="ivfpq-train", daemon=True)
+        self._trainer.start()
+
+    def _encode(self, rows, vectors):
+        labels, codes = pq_encode(vectors, self.centroids, self.codebooks)
+        previous = np.asarray(self._assign[rows])
+        self._codes[rows] = codes
+        self._assign[rows] = labels
+        # A row with a cluster has exactly one posting, in that cluster's list
+        for row, label, old in zip(rows.tolist(), labels.tolist(), previous.tolist()):
+            if label == old:
+                continue
+            if old >= 0:
+                self._lists[old].remove(row)
+            self._lists[label].append(row)
+
+    # -------------------- UPDATES --------------------
+    def _after_write(self, rows, vectors):
+        if self._written is not None:
+            self._written.extend(rows.tolist())
+        count = self.count()
+        if not self.trained:
+            if count >= self.TRAIN_MIN:
+                self._start_training(f"IVF-PQ: {count} vectors stored, training in the background")
+            return
+        if count >= self.trained_count * self.RETRAIN_GROWTH:
+            self._start_training(f"IVF-PQ: store grew from {self.trained_count} to {count} vectors, "
+                                 f"retraining in the background")
+        # Until a new model is swapped in, rows are encoded with the current one
+        self._encode(rows, vectors)
+        self._codes.flush()
+        self._assign.flush()
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self._written = None
+            self._clear_model()
+            for file_path in (self.model_path, self.codes_path, self.assign_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            return super().reset()
+
+    # -------------------- QUERIES --------------------
+    def query(self, embedding, n_results=10, where=None):
+        with self._lock:
+            if not self.trained or where:
+                # Filtered queries score the (usually small) matching set exactly
+                return super().query(embedding, n_results, where)
+
+            q = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+            coarse = self.centroids @ q
+            nprobe = min(self.nprobe, len(self.centroids))
+            probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+            postings = [np.frombuffer(self._lists[p], dtype=np.uint32) for p in probe.tolist()]
+            rows = np.concatenate(postings).astype(np.int64) if postings else np.empty(0, np.int64)
+            labels = np.repeat(probe, [len(p) for p in postings])
+            valid = self._live[rows] & (self._assign[rows] == labels)
+            rows, labels = rows[valid], labels[valid]
+            if len(rows) == 0:
+                return self._result([], [])
+
+            # Asymmetric distance: <q, centroid> + sum of per-subspace lookups
+            sub = self.dim // self.pq_m
+            lut = np.einsum('mkd,md->mk', self.codebooks, q.reshape(self.pq_m, sub))
+            approx = coarse[labels] + lut[np.arange(self.pq_m), self._codes[rows]].sum(axis=1)
+
+            shortlist = min(max(self.rerank, n_results), len(rows))
+            best = np.argpartition(-approx, shortlist - 1)[:shortlist]
+            return self._rerank(q, rows[best], n_results)
+
+    def footprint(self):
+        report = super().footprint()
+        with self._lock:
+            report["trained"] = self.trained
+            if self.trained:
+                report["nlist"] = len(self.centroids)
+                report["pq_m"] = self.pq_m
+                # Scanned data: codes, cluster ids, inverted lists, live flags, quantizers
+                report["memory_bytes"] = (self._high * (self.pq_m + 4)
+                                          + sum(len(p) for p in self._lists) * 4
+                                          + self.capacity
+                                          + self.centroids.nbytes + self.codebooks.nbytes)
+        return report
+
+    def close(self):
+        with self._lock:
+            self._generation += 1  # a running training stops at its next block
+        super().close()
@@ -0,0 +1,119 @@
+"""
+Lexical Index
+Persistent inverted index over chunk text (SQLite FTS5) with BM25 ranking. Catches
+exact terms the embedding model blurs: part numbers, error codes, names.
+"""
+
+import re
+import sqlite3
+import threading
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+class LexicalIndex:
+    # BM25 column weights: chunk text, filename
+    WEIGHTS = (1.0, 2.0)
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk_rows (
+                row_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chunk_id TEXT NOT NULL UNIQUE
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text, filename,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+        """)
+        self.conn.commit()
+
+    # -------------------- UPDATES --------------------
+    def add(self, chunk_ids, texts, filenames):
+        """Index (or re-index) chunks."""
+        if not chunk_ids:
+            return
+        with self._lock, self.conn:
+            self._delete(chunk_ids)
+            for chunk_id, text, filename in zip(chunk_ids, texts, filenames):
+                cur = self.conn.execute("INSERT INTO chunk_rows (chunk_id) VALUES (?)", (chunk_id,))
+                self.conn.execute(
+                    "INSERT INTO chunks_fts (rowid, text, filename) VALUES (?, ?, ?)",
+                    (cur.lastrowid, text or "", filename or "")
+                )
+
+    def delete(self, chunk_ids):
+        if not chunk_ids:
+            return
+        with self._lock, self.conn:
+            self._delete(chunk_ids)
+
+    def _delete(self, chunk_ids):
+        for i in range(0, len(chunk_ids), 500):
+            part = list(chunk_ids[i:i + 500])
+            placeholders = ",".join("?" * len(part))
+            rows = [r for (r,) in self.conn.execute(
+                f"SELECT row_id FROM chunk_rows WHERE chunk_id IN ({placeholders})", part
+            )]
+            if rows:
+                row_placeholders = ",".join("?" * len(rows))
+                self.conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN ({row_placeholders})", rows)
+                self.conn.execute(f"DELETE FROM chunk_rows WHERE row_id IN ({row_placeholders})", rows)
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM chunks_fts")
+            self.conn.execute("DELETE FROM chunk_rows")
+
+    # -------------------- QUERIES --------------------
+    @staticmethod
+    def build_query(query):
+        """
+        FTS5 expression: any of the query's words, each quoted so user input is never
+        parsed as FTS syntax. Hyphenated or dotted tokens (AB-1234, 0x8007.05) become
+        phrases so their parts must appear together.
+        """
+        clauses = []
+        for token in query.split():
+            parts = _TERM.findall(token)
+            if parts:
+                clauses.append('"' + " ".join(parts) + '"')
+        return " OR ".join(clauses)
+
+    def search(self, query, limit=30):
+        """
+        Returns:
+            list: (chunk_id, bm25_score) best first; higher scores are better
+        """
+        expression = self.build_query(query)
+        if not expression:
+            return []
+        with self._lock:
+            try:
+                rows = self.conn.execute(
+                    """
+                    SELECT r.chunk_id, -bm25(chunks_fts, ?, ?) AS score
+                    FROM chunks_fts JOIN chunk_rows r ON r.row_id = chunks_fts.rowid
+                    WHERE chunks_fts MATCH ?
+                    ORDER BY bm25(chunks_fts, ?, ?)
+                    LIMIT ?
+                    """,
+                    (*self.WEIGHTS, expression, *self.WEIGHTS, limit)
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Lexical search error: {e}")
+                return []
+        return rows
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunk_rows").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,542 @@
+"""
+File Manifest
+Local SQLite record of every indexed file (size, mtime, inode, content hash), the
+chunk IDs it produced and their text hashes, so rescans need one stat per file and
+no collection reads, and unchanged chunk text is never embedded twice.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 4
+
+
+class FileManifest:
+    def __init__(self, db_path):
+        """
+        Open (or create) the manifest database.
+
+        Args:
+            db_path (str): Path to the SQLite file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Every committed batch is a durable checkpoint (survives power loss) 
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self.conn:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            tables = {r[0] for r in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "files" in tables and (version < 2 or version > SCHEMA_VERSION):
+                # v1 document IDs were md5(path + mtime), not content hashes, and a newer 
+                # layout is unknown here: neither maps onto this schema, so start over 
+                self.conn.execute("DROP TABLE IF EXISTS files")
+                self.conn.execute("DROP TABLE IF EXISTS documents")
+                self.conn.execute("DROP TABLE IF EXISTS chunks")
+                tables.clear()
+            # An empty manifest knows none of the chunks already in the vector store; 
+            # VectorSearch sweeps them when this is set 
+            self.rebuilt = "files" not in tables
+
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER,
+                    content_hash TEXT,
+                    doc_id TEXT,
+                    indexed_at REAL,
+                    seen_at REAL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    chunk_ids TEXT
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    doc_id TEXT,
+                    text_hash TEXT
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS roots (
+                    path TEXT PRIMARY KEY,
+                    added_at REAL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    root TEXT,
+                    status TEXT,
+                    started_at REAL,
+                    updated_at REAL,
+                    files_done INTEGER DEFAULT 0
+                )
+            """)
+            if not self.rebuilt:
+                self._migrate(version)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_doc ON files(doc_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(text_hash)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id)")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate(self, version):
+        """Bring an existing manifest from `version` up to SCHEMA_VERSION in place."""
+        if version < 3:
+            # v3 added per-chunk rows: backfill them from the documents table. Their 
+            # text hashes are unknown, so these chunks are just never reused 
+            for doc_id, chunk_ids in self.conn.execute("SELECT doc_id, chunk_ids FROM documents").fetchall():
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO chunks (chunk_id, doc_id, text_hash) VALUES (?, ?, NULL)",
+                    [(cid, doc_id) for cid in json.loads(chunk_ids or "[]")]
+                )
+        if version < 4:
+            # v4 added seen_at: rows of an older manifest count as not seen by any scan yet 
+            columns = {r[1] for r in self.conn.execute("PRAGMA table_info(files)")}
+            if "seen_at" not in columns:
+                self.conn.execute("ALTER TABLE files ADD COLUMN seen_at REAL")
+
+    # -------------------- CHANGE DETECTION --------------------
+    @staticmethod
+    def file_state(stats):
+        """The parts of a stat result that identify a file version."""
+        return {"size": stats.st_size, "mtime_ns": stats.st_mtime_ns, "inode": stats.st_ino}
+
+    def changed_files(self, file_paths, progress_callback=None, batch_size=500):
+        """
+        Stat each path once and compare against the manifest.
+
+        Returns:
+            tuple: (list of (path, stat_result) that are new or modified, skipped count)
+        """
+        counts = {"seen": 0, "skipped": 0}
+        changed = []
+        for item in self.iter_changed(file_paths, counts, batch_size):
+            changed.append(item)
+            if progress_callback:
+                progress_callback(counts["seen"], len(file_paths))
+        if progress_callback:
+            progress_callback(len(file_paths), len(file_paths))
+        return changed, counts["skipped"]
+
+    def iter_changed(self, items, counts=None, batch_size=500):
+        """
+        Streaming change detection over paths or (path, stat_result) pairs.
+        Pairs reuse the caller's stat; plain paths are stat'ed once.
+
+        Yields:
+            (path, stat_result) for new or modified files
+        """
+        if counts is None:
+            counts = {"seen": 0, "skipped": 0}
+
+        batch = []
+        for item in items:
+            if isinstance(item, tuple):
+                batch.append(item)
+            else:
+                try:
+                    batch.append((item, os.stat(item)))
+                except OSError:
+                    continue
+
+            if len(batch) >= batch_size:
+                yield from self._filter_batch(batch, counts)
+                batch = []
+
+        if batch:
+            yield from self._filter_batch(batch, counts)
+
+    def _filter_batch(self, batch, counts):
+        known = self._lookup_states([path for path, _ in batch])
+        # Stamp every known path the scan found; files not stamped by a full scan are gone
+        self._mark_seen(list(known))
+        for path, stats in batch:
+            counts["seen"] += 1
+            if known.get(path) == self.file_state(stats):
+                counts["skipped"] += 1
+            else:
+                yield path, stats
+
+    def _lookup_states(self, paths):
+        if not paths:
+            return {}
+        placeholders = ",".join("?" * len(paths))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT path, size, mtime_ns, inode FROM files WHERE path IN ({placeholders})",
+                list(paths)
+            ).fetchall()
+        return {r[0]: {"size": r[1], "mtime_ns": r[2], "inode": r[3]} for r in rows}
+
+    def _mark_seen(self, paths):
+        if not paths:
+            return
+        placeholders = ",".join("?" * len(paths))
+        with self._lock, self.conn:
+            self.conn.execute(f"UPDATE files SET seen_at = ? WHERE path IN ({placeholders})",
+                              [time.time()] + list(paths))
+
+    # -------------------- RECORDING --------------------
+    @staticmethod
+    def text_hash(text):
+        return hashlib.blake2b(text.encode('utf-8', 'ignore'), digest_size=16).hexdigest()
+
+    def record_documents(self, documents, chunk_hashes=None):
+        """
+        Record indexed documents in one transaction.
+
+        Args:
+            documents (list): dicts with 'id', 'chunk_ids', 'content_hash',
+                'file_state' and 'metadata' (for the source path)
+            chunk_hashes (dict): chunk_id -> text hash for chunks written in this batch
+        """
+        now = time.time()
+        file_rows = []
+        doc_rows = []
+        chunk_rows = [(cid, cid.split('_chunk_')[0], h) for cid, h in (chunk_hashes or {}).items()]
+
+        for doc in documents:
+            state = doc.get("file_state")
+            if not state:
+                continue
+            file_rows.append((
+                doc["metadata"]["source"], state["size"], state["mtime_ns"], state["inode"],
+                doc.get("content_hash"), doc["id"], now, now
+            ))
+            # Duplicates only add a path reference to chunks another file produced 
+            if not doc.get("duplicate"):
+                doc_rows.append((doc["id"], json.dumps(doc.get("chunk_ids", []))))
+
+        if not file_rows and not chunk_rows:
+            return
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, doc_id, text_hash) VALUES (?, ?, ?)", chunk_rows
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, chunk_ids) VALUES (?, ?)", doc_rows
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, content_hash, doc_id, indexed_at, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                file_rows
+            )
+
+    # -------------------- QUERIES --------------------
+    def get(self, path):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT path, size, mtime_ns, inode, content_hash, doc_id, indexed_at FROM files WHERE path = ?",
+                (path,)
+            ).fetchone()
+        if not row:
+            return None
+        keys = ("path", "size", "mtime_ns", "inode", "content_hash", "doc_id", "indexed_at")
+        return dict(zip(keys, row))
+
+    def get_chunk_ids(self, doc_id):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT chunk_ids FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def find_chunks_by_text(self, text_hashes):
+        """Map chunk text hashes to an already-embedded chunk with the same text."""
+        text_hashes = list(set(text_hashes))
+        found = {}
+        for i in range(0, len(text_hashes), 500):
+            batch = text_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT text_hash, chunk_id FROM chunks WHERE text_hash IN ({placeholders})",
+                    batch
+                ).fetchall()
+            for text_hash, chunk_id in rows:
+                found.setdefault(text_hash, chunk_id)
+        return found
+
+    def known_doc_ids(self):
+        """IDs of every document whose chunks are in the index."""
+        with self._lock:
+            return {r[0] for r in self.conn.execute("SELECT doc_id FROM documents")}
+
+    def has_document(self, doc_id):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone() is not None
+
+    def paths_for_docs(self, doc_ids):
+        """Map each document ID to every indexed path holding the same content."""
+        doc_ids = list(set(doc_ids))
+        paths = {}
+        for i in range(0, len(doc_ids), 500):
+            batch = doc_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT doc_id, path FROM files WHERE doc_id IN ({placeholders}) ORDER BY path",
+                    batch
+                ).fetchall()
+            for doc_id, path in rows:
+                paths.setdefault(doc_id, []).append(path)
+        return paths
+
+    # -------------------- WATCHED ROOTS --------------------
+    def add_root(self, path):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO roots (path, added_at) VALUES (?, ?)", (path, time.time())
+            )
+
+    def get_roots(self):
+        with self._lock:
+            return [r[0] for r in self.conn.execute("SELECT path FROM roots ORDER BY path")]
+
+    def clear_roots(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM roots")
+
+    # -------------------- INDEXING JOBS --------------------
+    def start_job(self, root):
+        """ 
+        Register an indexing run for root. An interrupted run of the same root is 
+        resumed (same job, progress kept) instead of starting a new one. 
+
+        Returns: 
+            dict: job with 'id', 'root', 'files_done' and 'resumed' 
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id, files_done FROM jobs WHERE root = ? AND status = 'running' ORDER BY id DESC LIMIT 1",
+                (root,)
+            ).fetchone()
+            if row:
+                self.conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, row[0]))
+                # Older interrupted runs of the same root are covered by this one
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'done', updated_at = ? WHERE root = ? AND status = 'running' AND id < ?",
+                    (now, root, row[0])
+                )
+                return {"id": row[0], "root": root, "files_done": row[1], "resumed": True}
+
+            cur = self.conn.execute(
+                "INSERT INTO jobs (root, status, started_at, updated_at, files_done) VALUES (?, 'running', ?, ?, 0)",
+                (root, now, now)
+            )
+            return {"id": cur.lastrowid, "root": root, "files_done": 0, "resumed": False}
+
+    def update_job(self, job_id, files_done):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET files_done = ?, updated_at = ? WHERE id = ?",
+                (files_done, time.time(), job_id)
+            )
+
+    def finish_job(self, job_id, status="done"):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id)
+            )
+
+    def interrupted_jobs(self):
+        """Jobs still marked running: the app stopped before they finished."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, root, files_done, started_at FROM jobs WHERE status = 'running' ORDER BY id"
+            ).fetchall()
+        return [{"id": r[0], "root": r[1], "files_done": r[2], "started_at": r[3]} for r in rows]
+
+    # -------------------- RECONCILIATION --------------------
+    def paths_under(self, root):
+        """All manifest paths inside a folder (range scan on the primary key)."""
+        prefix = os.path.join(root, '')
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ?", (prefix, upper)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def unseen_paths_under(self, root, since):
+        """Manifest paths inside a folder that no scan or write has touched since `since`."""
+        prefix = os.path.join(root, '')
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ? AND (seen_at IS NULL OR seen_at < ?)",
+                (prefix, upper, since)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def iter_paths(self, batch_size=1000):
+        """Yield manifest paths in batches using keyset pagination."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT path FROM files WHERE path > ? ORDER BY path LIMIT ?", (last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [r[0] for r in rows]
+
+    def remove_paths(self, paths):
+        paths = list(paths)
+        with self._lock, self.conn:
+            for i in range(0, len(paths), 500):
+                batch = paths[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                self.conn.execute(f"DELETE FROM files WHERE path IN ({placeholders})", batch)
+
+    def orphaned_documents(self, limit=500):
+        """ 
+        Documents no file points to any more (file deleted, moved or modified). 
+
+        Returns:
+            dict: doc_id -> list of chunk IDs
+        """
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT d.doc_id, d.chunk_ids FROM documents d
+                WHERE NOT EXISTS (SELECT 1 FROM files f WHERE f.doc_id = d.doc_id)
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return {r[0]: json.loads(r[1]) for r in rows}
+
+    def unrecorded_chunks(self, doc_ids):
+        """
+        Chunks already written for documents that were never recorded (a batch
+        failed, or the run was drained before their last chunk).
+
+        Returns:
+            dict: doc_id -> list of chunk IDs
+        """
+        doc_ids = list(doc_ids)
+        chunks = {}
+        for i in range(0, len(doc_ids), 500):
+            batch = doc_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self.conn.execute(f"""
+                    SELECT c.chunk_id, c.doc_id FROM chunks c
+                    WHERE c.doc_id IN ({placeholders})
+                      AND NOT EXISTS (SELECT 1 FROM documents d WHERE d.doc_id = c.doc_id)
+                """, batch).fetchall()
+            for chunk_id, doc_id in rows:
+                chunks.setdefault(doc_id, []).append(chunk_id)
+        return chunks
+
+    def untracked_documents(self, limit=500):
+        """ 
+        Documents with chunks in the index but neither a documents row nor a file 
+        pointing to them (e.g. the process died before a half-written document was 
+        discarded). 
+
+        Returns:
+            dict: doc_id -> list of chunk IDs
+        """
+        with self._lock:
+            doc_ids = [r[0] for r in self.conn.execute("""
+                SELECT DISTINCT c.doc_id FROM chunks c
+                WHERE NOT EXISTS (SELECT 1 FROM documents d WHERE d.doc_id = c.doc_id)
+                  AND NOT EXISTS (SELECT 1 FROM files f WHERE f.doc_id = c.doc_id)
+                LIMIT ?
+            """, (limit,))]
+        return self.unrecorded_chunks(doc_ids)
+
+    def delete_documents(self, doc_ids):
+        doc_ids = list(doc_ids)
+        with self._lock, self.conn:
+            for i in range(0, len(doc_ids), 500):
+                batch = doc_ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                self.conn.execute(f"DELETE FROM documents WHERE doc_id IN ({placeholders})", batch)
+                self.conn.execute(f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", batch)
+
+    def health(self):
+        """Counts of files, documents and chunks that are still referenced."""
+        with self._lock:
+            files = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            orphaned = self.conn.execute("""
+                SELECT COUNT(*) FROM documents d
+                WHERE NOT EXISTS (SELECT 1 FROM files f WHERE f.doc_id = d.doc_id)
+            """).fetchone()[0]
+            live_chunks = self.conn.execute("""
+                SELECT COUNT(*) FROM chunks c
+                WHERE EXISTS (SELECT 1 FROM files f WHERE f.doc_id = c.doc_id)
+            """).fetchone()[0]
+        return {
+            "files": files,
+            "documents": documents,
+            "orphaned_documents": orphaned,
+            "live_chunks": live_chunks
+        }
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM documents")
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM jobs")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class ManifestReader:
+    """
+    Read-only document lookups for extraction workers. Pickles as just the database
+    path; every thread (or worker process) opens its own connection on first use,
+    so nothing is loaded up front and lookups never contend for the manifest lock.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _conn(self):
+        conns = self._local.__dict__.setdefault("conns", {})
+        conn = conns.get(self.db_path)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            conns[self.db_path] = conn
+        return conn
+
+    def has_document(self, doc_id):
+        """True if the document's chunks are in the index (primary key lookup)."""
+        return self._conn().execute(
+            "SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone() is not None
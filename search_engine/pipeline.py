@@ -0,0 +1,266 @@
+"""
+Indexing Pipeline
+Runs extraction, chunking, embedding and database writes as overlapping stages
+connected by bounded queues, so the embedding model never waits on disk or SQLite.
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+def _new_batch():
+    # doc_ids: documents with chunks in this batch; docs: documents whose last chunk is in it
+    return {"ids": [], "documents": [], "metadatas": [], "embeddings": None, "docs": [], "doc_ids": set()}
+
+
+class IndexPipeline:
+    def __init__(self, chunk_fn, embed_fn, write_fn, batch_size=100, queue_size=4, doc_queue_size=16):
+        """
+        Initialize the pipeline.
+
+        Args:
+            chunk_fn (callable): document -> iterable of (chunk_id, text, metadata)
+            embed_fn (callable): list of texts -> embeddings array
+            write_fn (callable): batch dict -> None (persists ids/documents/metadatas/embeddings)
+            batch_size (int): Number of chunks per embedding batch
+            queue_size (int): Capacity of each batch queue between stages
+            doc_queue_size (int): Capacity of the document queue, in documents (each holds
+                one file's text, or one group of its pages)
+        """
+        self.chunk_fn = chunk_fn
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.doc_queue_size = doc_queue_size
+
+        self._stop = threading.Event()
+        self._draining = threading.Event()
+        self._finished = threading.Event()
+        self.stats = {}
+
+    # -------------------- QUEUE HELPERS --------------------
+    def _put(self, q, item):
+        """Blocking put that gives up once the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q, stage):
+        start = time.perf_counter()
+        while True:
+            try:
+                item = q.get(timeout=0.2)
+                break
+            except queue.Empty:
+                if self._stop.is_set():
+                    item = _DONE
+                    break
+        self.stats[stage]["wait"] += time.perf_counter() - start
+        return item
+
+    def stop(self):
+        """Ask every stage to finish as soon as possible, discarding queued work."""
+        self._stop.set()
+
+    def drain(self):
+        """ 
+        Stop taking new documents but finish (embed and write) every batch already 
+        assembled, so nothing that was paid for is lost. Used for graceful shutdown. 
+        """
+        self._draining.set()
+
+    def is_draining(self):
+        return self._draining.is_set()
+
+    def wait(self, timeout=None):
+        """Block until run() has returned. Returns False on timeout."""
+        return self._finished.wait(timeout)
+
+    # -------------------- STAGES --------------------
+    def _extract_stage(self, documents, out_q):
+        """Pulls documents from the (threaded) extractor generator."""
+        stats = self.stats["extract"]
+        try:
+            iterator = iter(documents)
+            while not self._stop.is_set() and not self._draining.is_set():
+                start = time.perf_counter()
+                try:
+                    doc = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats["busy"] += time.perf_counter() - start
+                stats["items"] += 1
+                if not self._put(out_q, doc):
+                    break
+        except Exception as e:
+            print(f"Extraction stage error: {e}")
+        finally:
+            self._put(out_q, _DONE)
+
+    def _chunk_stage(self, in_q, out_q):
+        """Splits documents into chunks and groups them into embedding batches."""
+        stats = self.stats["chunk"]
+        batch = _new_batch()
+        try:
+            while True:
+                doc = self._get(in_q, "chunk")
+                if doc is _DONE or self._draining.is_set():
+                    break
+
+                # chunk_fn may be a generator: long documents are flushed in several
+                # batches instead of being held in memory whole
+                start = time.perf_counter()
+                try:
+                    for chunk_id, text, metadata in self.chunk_fn(doc):
+                        if self._draining.is_set():
+                            # Partial document: its chunks are kept, the document is redone later
+                            raise InterruptedError("pipeline draining")
+                        batch["ids"].append(chunk_id)
+                        batch["documents"].append(text)
+                        batch["metadatas"].append(metadata)
+                        batch["doc_ids"].add(doc.get("id"))
+                        stats["items"] += 1
+
+                        if len(batch["ids"]) >= self.batch_size:
+                            stats["busy"] += time.perf_counter() - start
+                            if not self._put(out_q, batch):
+                                return
+                            batch = _new_batch()
+                            start = time.perf_counter()
+                    # A document is reported done with the batch holding its last chunk
+                    batch["docs"].append(doc)
+                except InterruptedError:
+                    pass
+                except Exception as e:
+                    # Not reported done, so it is retried on the next run
+                    print(f"Error chunking document: {e}")
+                stats["busy"] += time.perf_counter() - start
+
+                if len(batch["ids"]) >= self.batch_size:
+                    if not self._put(out_q, batch):
+                        return
+                    batch = _new_batch()
+
+            if batch["docs"] or batch["ids"]:
+                self._put(out_q, batch)
+        except Exception as e:
+            print(f"Chunking stage error: {e}")
+        finally:
+            self._put(out_q, _DONE)
+
+    def _embed_stage(self, in_q, out_q):
+        """Runs the embedding model over each batch."""
+        stats = self.stats["embed"]
+        try:
+            while True:
+                batch = self._get(in_q, "embed")
+                if batch is _DONE:
+                    break
+
+                if batch["documents"]:
+                    start = time.perf_counter()
+                    try:
+                        batch["embeddings"] = self.embed_fn(batch["documents"])
+                    except Exception as e:
+                        print(f"Error embedding batch: {e}")
+                        batch["embeddings"] = None
+                    stats["busy"] += time.perf_counter() - start
+                    stats["items"] += len(batch["documents"])
+
+                if not self._put(out_q, batch):
+                    return
+        except Exception as e:
+            print(f"Embedding stage error: {e}")
+        finally:
+            self._put(out_q, _DONE)
+
+    # -------------------- RUN --------------------
+    def run(self, documents, progress_callback=None):
+        """
+        Feed documents through the pipeline. Database writes happen on the calling thread.
+
+        Returns:
+            int: Number of documents written
+        """
+        self._stop.clear()
+        self._draining.clear()
+        self._finished.clear()
+        self.stats = {stage: {"busy": 0.0, "wait": 0.0, "items": 0}
+                      for stage in ("extract", "chunk", "embed", "write")}
+
+        doc_q = queue.Queue(maxsize=self.doc_queue_size)
+        batch_q = queue.Queue(maxsize=self.queue_size)
+        write_q = queue.Queue(maxsize=self.queue_size)
+
+        workers = [
+            threading.Thread(target=self._extract_stage, args=(documents, doc_q), daemon=True),
+            threading.Thread(target=self._chunk_stage, args=(doc_q, batch_q), daemon=True),
+            threading.Thread(target=self._embed_stage, args=(batch_q, write_q), daemon=True),
+        ]
+        for w in workers:
+            w.start()
+
+        started = time.perf_counter()
+        count = 0
+        # Documents with chunks in a failed batch; never recorded, so they are retried
+        failed = set()
+        stats = self.stats["write"]
+        try:
+            while True:
+                batch = self._get(write_q, "write")
+                if batch is _DONE:
+                    break
+
+                embed_failed = batch["ids"] and (batch["embeddings"] is None or len(batch["embeddings"]) == 0)
+                if embed_failed:
+                    failed.update(batch["doc_ids"])
+                # A document is incomplete if any of its batches failed, even an earlier one
+                batch["docs"] = [doc for doc in batch["docs"] if doc.get("id") not in failed]
+
+                if not embed_failed and (batch["docs"] or batch["ids"]):
+                    start = time.perf_counter()
+                    try:
+                        self.write_fn(batch)
+                        if batch["ids"] and "first_results" not in self.stats:
+                            # Time to first useful results: the first chunks become searchable
+                            self.stats["first_results"] = time.perf_counter() - started
+                    except Exception as e:
+                        print(f"Error writing batch: {e}")
+                        failed.update(batch["doc_ids"])
+                        batch["docs"] = []
+                    stats["busy"] += time.perf_counter() - start
+                    stats["items"] += len(batch["ids"])
+
+                for doc in batch["docs"]:
+                    count += 1
+                    if progress_callback:
+                        progress_callback(count, doc.get("metadata", {}).get("filename", ""))
+                    elif count % 100 == 0:
+                        print(f"Processed {count} documents...")
+        finally:
+            self._stop.set()
+            for w in workers:
+                w.join(timeout=5.0)
+            self._finished.set()
+
+        self.stats["elapsed"] = time.perf_counter() - started
+        self._print_stats()
+        return count
+
+    def _print_stats(self):
+        elapsed = self.stats.get("elapsed", 0.0)
+        print(f"Pipeline finished in {elapsed:.1f}s")
+        if "first_results" in self.stats:
+            print(f"   first results searchable after {self.stats['first_results']:.1f}s")
+        for stage in ("extract", "chunk", "embed", "write"):
+            s = self.stats[stage]
+            print(f"   {stage:<8} busy {s['busy']:.1f}s | waiting {s['wait']:.1f}s | items {s['items']}")
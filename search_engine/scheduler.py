@@ -0,0 +1,98 @@
+"""
+Index Scheduler
+Orders indexing work by priority so the most useful files become searchable first:
+pinned folders, then recently modified (or smallest) files.
+"""
+
+import os
+import heapq
+import itertools
+import threading
+import time
+
+
+class IndexScheduler:
+    POLICIES = ('recent', 'small', 'fifo')
+
+    def __init__(self, policy='recent', pinned_folders=(), window=50000, warmup=1.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            policy (str): 'recent' (newest mtime first), 'small' (smallest first) or 'fifo'
+            pinned_folders (iterable): Folders whose files always go first
+            window (int): Maximum files buffered for ordering while the scan is running
+            warmup (float): Seconds to collect candidates before the first file is released
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.policy = policy
+        self.pinned_folders = [os.path.join(os.path.abspath(f), '') for f in pinned_folders]
+        self.window = window
+        self.warmup = warmup
+
+    def pin_folder(self, folder):
+        prefix = os.path.join(os.path.abspath(folder), '')
+        if prefix not in self.pinned_folders:
+            self.pinned_folders.append(prefix)
+
+    def priority(self, path, stats):
+        """Sort key; lower values are indexed first."""
+        pinned = 0 if any(path.startswith(p) for p in self.pinned_folders) else 1
+        if self.policy == 'recent':
+            return pinned, -stats.st_mtime
+        if self.policy == 'small':
+            return pinned, stats.st_size
+        return pinned, 0
+
+    def order(self, items):
+        """
+        Reorder a stream of (path, stat_result) pairs. A feeder thread keeps draining
+        the (possibly still scanning) input into a bounded heap while the consumer
+        always takes the highest-priority file seen so far.
+        """
+        heap = []
+        counter = itertools.count()
+        cond = threading.Condition()
+        stop = threading.Event()
+        finished = [False]
+
+        def feed():
+            try:
+                for path, stats in items:
+                    with cond:
+                        while len(heap) >= self.window and not stop.is_set():
+                            cond.wait(timeout=0.2)
+                        if stop.is_set():
+                            return
+                        heapq.heappush(heap, (self.priority(path, stats), next(counter), path, stats))
+                        cond.notify_all()
+            except Exception as e:
+                print(f"Scheduler feed error: {e}")
+            finally:
+                with cond:
+                    finished[0] = True
+                    cond.notify_all()
+
+        threading.Thread(target=feed, daemon=True).start()
+
+        # Give the scan a head start so the first picks are meaningful
+        deadline = time.monotonic() + self.warmup
+        with cond:
+            while not finished[0] and len(heap) < self.window and time.monotonic() < deadline:
+                cond.wait(timeout=max(0.0, deadline - time.monotonic()))
+
+        try:
+            while True:
+                with cond:
+                    while not heap and not finished[0]:
+                        cond.wait(timeout=0.2)
+                    if not heap:
+                        return
+                    _, _, path, stats = heapq.heappop(heap)
+                    cond.notify_all()
+                yield path, stats
+        finally:
+            stop.set()
+            with cond:
+                cond.notify_all()
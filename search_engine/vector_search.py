@@ -1,149 +1,357 @@
 """ 
 Vector Search Engine 
-Handles ChromaDB-based similarity search for document retrieval. 
+Handles similarity search for document retrieval over a pluggable vector store 
+(ChromaDB or an exact memory-mapped flat store, see vector_store.py). 
 """
 
 import os
 import sys
-import shutil
-import gc
+import json
 import time
-import chromadb
-from chromadb.config import Settings  # <--- Essential for Reset Permission 
+import threading
+import numpy as np
 from search_engine.embedder import Embedder
+from search_engine.embedding_cache import EmbeddingCache
+from search_engine.index_config import IndexConfig
+from search_engine.query_cache import LRUCache
+from search_engine.lexical_index import LexicalIndex
+from search_engine.filename_index import FilenameIndex
+from search_engine.vector_store import open_vector_store
+from search_engine.pipeline import IndexPipeline
+from search_engine.manifest import FileManifest
+from search_engine.chunker import TextChunker, TokenChunker
 
 
 class VectorSearch:
-    def __init__(self):
-        """Initialize the vector search engine with ChromaDB."""
-        self.embedder = Embedder()
+    # Reciprocal rank fusion constant (standard value; damps the weight of top ranks) 
+    RRF_K = 60
 
+    def __init__(self, data_dir=None, precision=None, vector_store=None):
+        """
+        Initialize the vector search engine.
+
+        Args:
+            data_dir (str): Folder holding the index (default: <app>/data)
+            precision (str): 'fp32' or 'int8' embedding model; None uses the index's setting
+            vector_store (str): 'chroma', 'flat', 'ivfpq' or 'binary'; None uses the index's setting
+        """
         # Determine database path 
-        if getattr(sys, 'frozen', False):
-            base_dir = os.path.dirname(sys.executable)
-        else:
-            base_dir = os.path.join(os.path.dirname(__file__), '..')
+        if data_dir is None:
+            if getattr(sys, 'frozen', False):
+                base_dir = os.path.dirname(sys.executable)
+            else:
+                base_dir = os.path.join(os.path.dirname(__file__), '..')
+            data_dir = os.path.join(base_dir, 'data')
+        self.data_dir = data_dir
 
-        self.db_path = os.path.join(base_dir, 'data', 'chroma_db')
+        # Per-file record of what is indexed (replaces full-collection ID scans) 
+        self.manifest = FileManifest(os.path.join(data_dir, 'manifest.db'))
 
-        # Initialize Database with RESET permissions  
-        self._init_db()
+        # The model variant is a property of the index: its vectors must not be mixed 
+        self.config = IndexConfig(os.path.join(data_dir, 'index_config.json'))
+        indexed = self.manifest.count() > 0
+        if precision and precision != self.config.get("precision") and indexed:
+            print(f"Index was built with {self.config.get('precision')} embeddings; "
+                  f"ignoring precision={precision} (clear the index to switch)")
+            precision = None
+        self.embedder = Embedder(precision=precision or self.config.get("precision"))
+        if not indexed or not self.config.exists:
+            self.config.set(precision=self.embedder.precision)
 
-    def _init_db(self):
-        """Helper to initialize the DB with specific settings."""
-        if not os.path.exists(self.db_path):
-            os.makedirs(self.db_path)
+        # So is the vector store: switching backends needs a rebuild 
+        if vector_store and vector_store != self.config.get("vector_store") and indexed:
+            print(f"Index is stored in {self.config.get('vector_store')}; "
+                  f"ignoring vector_store={vector_store} (clear the index to switch)")
+        elif vector_store:
+            self.config.set(vector_store=vector_store)
 
-        self.client = chromadb.PersistentClient(
-            path=self.db_path,
-            settings=Settings(allow_reset=True)  # <--- THIS FIXES THE LOCK 
+        # Survives clear_database(): re-indexing the same text costs disk reads, not inference 
+        self.embedding_cache = EmbeddingCache(
+            os.path.join(data_dir, 'embedding_cache'), self.embedder.model_id
         )
+        self.embedder.cache = self.embedding_cache
 
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
-        print(f"VectorSearch initialized at {self.db_path}")
+        # Chunks are sized in model tokens so none are truncated at the model limit 
+        tokenizer, max_length = self.embedder.get_tokenizer()
+        if tokenizer is not None:
+            # [CLS] and [SEP] take two positions of the model's sequence length 
+            self.chunker = TokenChunker(tokenizer, max_tokens=max_length - 2, overlap_tokens=max_length // 10)
+        else:
+            self.chunker = TextChunker(chunk_size=1000, chunk_overlap=100)
 
-    def _recursive_text_split(self, text, chunk_size=1000, chunk_overlap=100):
-        if not text:
-            return []
-        chunks = []
-        start = 0
-        text_len = len(text)
-        while start < text_len:
-            end = start + chunk_size
-            if end >= text_len:
-                chunks.append(text[start:])
-                break
-            break_point = -1
-            for sep in ['\n\n', '\n', '. ', ' ']:
-                idx = text.rfind(sep, start, end)
-                if idx != -1 and idx > start + (chunk_size // 2):
-                    break_point = idx + len(sep)
-                    break
-            if break_point != -1:
-                chunks.append(text[start:break_point])
-                start = break_point - chunk_overlap
+        # Document IDs chunked during the current add_documents run 
+        self._run_doc_ids = set()
+        # Of those, documents not recorded in the manifest yet 
+        self._incomplete_docs = set()
+
+        # Stage timings of the last indexing run (incl. time to first results) 
+        self.last_run_stats = {}
+
+        # Pipeline of the indexing run in progress (for graceful shutdown) 
+        self._active_pipeline = None
+
+        # Serializes index writes (indexing runs, garbage collection) 
+        self._write_lock = threading.RLock()
+
+        # Repeated queries skip inference and the vector query entirely. Every write 
+        # bumps the generation, so cached results never outlive the index they came from 
+        self.index_generation = 0
+        self.query_embedding_cache = LRUCache(max_size=1024)
+        self.result_cache = LRUCache(max_size=256)
+
+        # BM25 over the same chunks, fused with vector results at query time 
+        self.lexical_index = LexicalIndex(os.path.join(data_dir, 'lexical.db'))
+
+        # Instant name/path matches, loaded from the manifest in the background 
+        self.filename_index = FilenameIndex()
+        threading.Thread(
+            target=self.filename_index.build, args=(self.manifest.iter_paths(),), daemon=True
+        ).start()
+
+        self._init_db()
+
+        if self.manifest.rebuilt:
+            # New or rebuilt manifest over an existing index: none of its chunks can be 
+            # found again by a rescan, so they would stay in search results forever 
+            self.lexical_index.clear()
+            self.config.set(lexical_index_complete=True)
+            if self.store.count() > 0:
+                threading.Thread(target=self._sweep_unknown_chunks, daemon=True).start()
+        elif not self.config.get("lexical_index_complete"):
+            if self.store.count() == 0:
+                self.config.set(lexical_index_complete=True)
             else:
-                chunks.append(text[start:end])
-                start = end - chunk_overlap
-        return chunks
+                # Index built before the lexical index existed 
+                threading.Thread(target=self._backfill_lexical_index, daemon=True).start()
+
+    def _bump_generation(self):
+        self.index_generation += 1
+
+    def _init_db(self):
+        """Open the vector store configured for this index."""
+        self._bump_generation()
+        self.store = open_vector_store(
+            self.config.get("vector_store"), self.data_dir,
+            dtype=self.config.get("flat_dtype"),
+            nprobe=self.config.get("ivf_nprobe"),
+            pq_m=self.config.get("ivf_pq_m"),
+            rerank=self.config.get("ivf_rerank"),
+            binary_rerank=self.config.get("binary_rerank"),
+            hnsw_m=self.config.get("hnsw_m"),
+            hnsw_construction_ef=self.config.get("hnsw_construction_ef"),
+            hnsw_search_ef=self.config.get("hnsw_search_ef")
+        )
+        self.db_path = self.store.path
+        print(f"VectorSearch initialized at {self.db_path} ({self.store.name} store)")
 
     def add_documents(self, documents_generator, batch_size=100, progress_callback=None):
-        batch_ids, batch_documents, batch_metadatas = [], [], []
-        count = 0
+        """
+        Index documents through the staged pipeline. Extraction, chunking, embedding
+        and vector store writes run concurrently, connected by bounded queues.
+        """
+        with self._write_lock:
+            self._run_doc_ids = set()
+            self._incomplete_docs = set()
+            self.reuse_stats = {"reused": 0, "embedded": 0}
+            self.chunker.reset_stats()
+            # Each embedding batch is split across the worker processes; keep it large 
+            # enough to give every worker a full model batch 
+            batch_size = max(batch_size, 32 * self.embedder.workers)
+            pipeline = IndexPipeline(
+                chunk_fn=self._chunk_document,
+                embed_fn=self._embed_chunks,
+                write_fn=self._write_batch,
+                batch_size=batch_size
+            )
+            self._active_pipeline = pipeline
+            try:
+                count = pipeline.run(self._normalize_documents(documents_generator), progress_callback)
+            finally:
+                self._active_pipeline = None
+            self.last_run_stats = pipeline.stats
+            self._run_doc_ids = set()
+            # A failed batch or a drain leaves documents half written; they are redone 
+            # on the next run, so drop the chunks they already have 
+            self._discard_incomplete()
+            print(f"Finished adding {count} documents. "
+                  f"Chunks embedded: {self.reuse_stats['embedded']}, reused without inference: {self.reuse_stats['reused']}")
+            cache = self.embedding_cache.stats()
+            print(f"Embedding cache: {cache['entries']} vectors, {cache['hits']} hits / {cache['misses']} misses "
+                  f"({cache['hit_rate']:.0%}), {cache['evictions']} evicted")
+            dist = self.chunker.chunk_distribution()
+            if dist["documents"]:
+                print(f"Chunks per document: mean {dist['mean']:.1f} | median {dist['median']} | "
+                      f"p90 {dist['p90']} | max {dist['max']} ({dist['chunks']} chunks)")
 
+            # Modified files leave their previous version's chunks behind 
+            if not pipeline.is_draining():
+                self.collect_garbage()
+
+    def _normalize_documents(self, documents_generator):
+        """Accepts both (id, content, path) tuples and indexer dicts."""
         for item in documents_generator:
             if isinstance(item, tuple):
                 base_id, content, file_path = item
-                metadata = {"source": file_path, "filename": os.path.basename(file_path)}
-            else:
-                content = item['content']
-                base_id = item['id']
-                metadata = item['metadata']
-
-            chunks = self._recursive_text_split(content)
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{base_id}_chunk_{i}"
-                batch_ids.append(chunk_id)
-                batch_documents.append(chunk)
-                chunk_meta = metadata.copy()
-                chunk_meta['chunk_index'] = i
-                batch_metadatas.append(chunk_meta)
-
-            if len(batch_ids) >= batch_size:
-                self._process_batch(batch_ids, batch_documents, batch_metadatas)
-                batch_ids, batch_documents, batch_metadatas = [], [], []
-
-            count += 1
-            if progress_callback:
-                progress_callback(count, metadata.get('filename', ''))
-            elif count % 100 == 0:
-                print(f"Processed {count} documents...")
-
-        if batch_ids:
-            self._process_batch(batch_ids, batch_documents, batch_metadatas)
-        print(f"Finished adding {count} documents.")
-
-    def _process_batch(self, ids, documents, metadatas):
+                try:
+                    file_state = FileManifest.file_state(os.stat(file_path))
+                except OSError:
+                    # No file behind it: tracked under its path until reconcile drops it 
+                    file_state = {"size": 0, "mtime_ns": 0, "inode": 0}
+                item = {
+                    "id": base_id,
+                    "content": content,
+                    "metadata": {"source": file_path, "filename": os.path.basename(file_path)},
+                    "file_state": file_state
+                }
+            yield item
+
+    def _chunk_document(self, item):
+        """Yields (chunk_id, text, metadata); paged documents (PDF) are chunked page by page."""
+        doc_id = item['id']
+        if item.get('duplicate') or doc_id in self._run_doc_ids or self.manifest.has_document(doc_id):
+            # Same bytes already embedded (earlier run or earlier in this run): reference only 
+            item['duplicate'] = True
+            return
+        self._run_doc_ids.add(doc_id)
+        self._incomplete_docs.add(doc_id)
+
+        if item.get('segments') is not None:
+            pieces = self.chunker.split_segments(item['segments'])
+        else:
+            pieces = ((chunk, None, None) for chunk in self.chunker.split(item['content']))
+
+        item['chunk_ids'] = []
+        for i, (chunk, page_start, page_end) in enumerate(pieces):
+            chunk_meta = item['metadata'].copy()
+            chunk_meta['chunk_index'] = i
+            if page_start is not None:
+                chunk_meta['page_start'] = page_start
+                chunk_meta['page_end'] = page_end
+            chunk_id = f"{doc_id}_chunk_{i}"
+            item['chunk_ids'].append(chunk_id)
+            yield chunk_id, chunk, chunk_meta
+        self.chunker.record_document(len(item['chunk_ids']))
+
+        if not item['chunk_ids']:
+            # No extractable text (e.g. scanned PDF): keep the file findable by name 
+            chunk_id = f"{doc_id}_chunk_0"
+            item['chunk_ids'].append(chunk_id)
+            chunk_meta = item['metadata'].copy()
+            chunk_meta['chunk_index'] = 0
+            yield chunk_id, item['metadata']['filename'], chunk_meta
+
+    def _embed_chunks(self, texts):
+        """ 
+        Embed only chunk text that is new to the index. Chunks whose exact text is 
+        already stored (unchanged parts of an edited file, shared boilerplate) are 
+        re-keyed with their existing vectors. 
+        """
+        hashes = [FileManifest.text_hash(t) for t in texts]
+        existing = self.manifest.find_chunks_by_text(hashes)
+        stored = self._get_embeddings(list(set(existing.values()))) if existing else {}
+
+        vectors = {}
+        for h in hashes:
+            chunk_id = existing.get(h)
+            if chunk_id in stored:
+                vectors[h] = stored[chunk_id]
+
+        # Embed each missing text once, even if it repeats within the batch 
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in vectors:
+                missing.setdefault(h, t)
+
+        if missing:
+            embeddings = self.embedder.embed_texts(list(missing.values()))
+            if len(embeddings) != len(missing):
+                return np.array([])
+            vectors.update(zip(missing.keys(), embeddings))
+
+        self.reuse_stats["embedded"] += len(missing)
+        self.reuse_stats["reused"] += len(texts) - len(missing)
+        return np.array([vectors[h] for h in hashes], dtype=np.float32)
+
+    def _get_embeddings(self, chunk_ids):
+        """Fetch stored vectors by chunk ID. Missing IDs are simply absent from the result."""
+        found = {}
         try:
-            embeddings = self.embedder.embed_texts(documents)
-            self.collection.upsert(
-                ids=ids, 
-                documents=documents, 
-                metadatas=metadatas, 
-                embeddings=embeddings.tolist()
-            )
+            for i in range(0, len(chunk_ids), 500):
+                result = self.store.get(ids=chunk_ids[i:i + 500], include=["embeddings"])
+                for cid, emb in zip(result['ids'], result['embeddings']):
+                    found[cid] = np.asarray(emb, dtype=np.float32)
         except Exception as e:
-            print(f"Error processing batch: {e}")
+            print(f"Error fetching stored embeddings: {e}")
+        return found
+
+    def _write_batch(self, batch):
+        if batch["ids"]:
+            self.store.upsert(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"]
+            )
+            self.lexical_index.add(
+                batch["ids"], batch["documents"], [m.get('filename', '') for m in batch["metadatas"]]
+            )
+        chunk_hashes = {cid: FileManifest.text_hash(t) for cid, t in zip(batch["ids"], batch["documents"])}
+        # Only documents whose last chunk is in this batch are complete
+        self.manifest.record_documents(batch["docs"], chunk_hashes)
+        self._incomplete_docs.difference_update(d["id"] for d in batch["docs"])
+        self.filename_index.add([d["metadata"]["source"] for d in batch["docs"] if d["metadata"].get("source")])
+        self._bump_generation()
+
+    def _embed_query(self, query):
+        key = (self.embedder.model_id, query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.embedder.embed_text(query)
+            if len(embedding) > 0:
+                self.query_embedding_cache.put(key, embedding)
+        return embedding
 
     def search(self, query, top_k=10, filter_metadata=None):
+        cache_key = (query, top_k, json.dumps(filter_metadata, sort_keys=True), self.index_generation)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            # Copies, so callers can annotate results without touching the cache 
+            return [dict(c) for c in cached]
+
         try:
-            if self.collection.count() == 0:
+            if self.store.count() == 0:
                 return []
-            query_embedding = self.embedder.embed_text(query)
+            query_embedding = self._embed_query(query)
             candidate_k = top_k * 3
-            results = self.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=candidate_k,
-                where=filter_metadata
-            )
-            if not results['ids']:
+            results = self.store.query(query_embedding, n_results=candidate_k, where=filter_metadata)
+            rows = {}
+            for cid, distance, metadata, document in zip(results['ids'], results['distances'],
+                                                         results['metadatas'], results['documents']):
+                rows[cid] = (distance, metadata, document)
+
+            # Exact-term matches the vector search did not return 
+            lexical = self.lexical_index.search(query, limit=candidate_k)
+            missing = [cid for cid, _ in lexical if cid not in rows]
+            if missing:
+                extra = self.store.get(
+                    ids=missing, where=filter_metadata, include=["documents", "metadatas", "embeddings"]
+                )
+                q = query_embedding / (np.linalg.norm(query_embedding) or 1.0)
+                for cid, metadata, document, emb in zip(extra['ids'], extra['metadatas'],
+                                                        extra['documents'], extra['embeddings']):
+                    emb = np.asarray(emb, dtype=np.float32)
+                    rows[cid] = (1 - float(np.dot(q, emb / (np.linalg.norm(emb) or 1.0))), metadata, document)
+            if not rows:
                 return []
 
-            ids = results['ids'][0]
-            distances = results['distances'][0]
-            metadatas = results['metadatas'][0]
-            documents = results['documents'][0]
             candidates = []
             query_lower = query.lower().strip()
 
-            for i in range(len(ids)):
-                base_score = 1 - (distances[i])
+            for cid, (distance, metadata, document) in rows.items():
+                base_score = 1 - distance
                 final_score = base_score
-                content_text = documents[i] or ""
-                metadata = metadatas[i] or {}
+                content_text = document or ""
+                metadata = metadata or {}
                 filename = metadata.get('filename', '').lower()
 
                 if query_lower in filename:
@@ -153,7 +361,7 @@ class VectorSearch:
                 final_score = min(1.0, final_score)
 
                 candidates.append({
-                    'id': ids[i],
+                    'id': cid,
                     'similarity': max(0.0, float(final_score)),
                     'content': content_text,
                     'metadata': metadata,
@@ -161,19 +369,124 @@ class VectorSearch:
                     'filename': metadata.get('filename', 'Unknown'),
                 })
             candidates.sort(key=lambda x: x['similarity'], reverse=True)
-            return candidates[:top_k]
+
+            # Reciprocal rank fusion of the semantic and the BM25 ranking 
+            lexical_rank = {cid: rank for rank, (cid, _) in enumerate((c for c in lexical if c[0] in rows), 1)}
+            bm25 = dict(lexical)
+            for rank, c in enumerate(candidates, 1):
+                c['bm25'] = bm25.get(c['id'], 0.0)
+                c['rrf'] = 1.0 / (self.RRF_K + rank)
+                if c['id'] in lexical_rank:
+                    c['rrf'] += 1.0 / (self.RRF_K + lexical_rank[c['id']])
+            candidates.sort(key=lambda x: x['rrf'], reverse=True)
+
+            candidates = candidates[:top_k]
+            self._resolve_paths(candidates)
+            self.result_cache.put(cache_key, [dict(c) for c in candidates])
+            return candidates
         except Exception as e:
             print(f"Search error: {e}")
             return []
 
+    def search_filenames(self, query, limit=10):
+        """ 
+        Substring/fuzzy match on file names and folders only: no embedding, no vector 
+        query, a few milliseconds even for millions of files. Results have the same 
+        shape as search() results, with 'match' telling how they matched. 
+        """
+        results = []
+        for path, score, match in self.filename_index.search(query, limit=limit):
+            results.append({
+                'id': None,
+                'similarity': score,
+                'content': os.path.dirname(path),
+                'metadata': {'source': path, 'filename': os.path.basename(path)},
+                'file_path': path,
+                'filename': os.path.basename(path),
+                'match': match,
+                'duplicates': [],
+            })
+        return results
+
+    def _resolve_paths(self, candidates):
+        """ 
+        Chunks are shared by every file with identical bytes. Point each result at a 
+        path that still holds the content and list the other copies. 
+        """
+        doc_paths = self.manifest.paths_for_docs(c['id'].split('_chunk_')[0] for c in candidates)
+        for c in candidates:
+            paths = doc_paths.get(c['id'].split('_chunk_')[0], [])
+            if paths and c['file_path'] not in paths:
+                c['file_path'] = paths[0]
+                c['filename'] = os.path.basename(paths[0])
+            c['duplicates'] = [p for p in paths if p != c['file_path']]
+
+    def warm_up(self):
+        """ 
+        Run one query end to end (model inference and the vector index load) so the 
+        first real search does not pay for it. 
+        """
+        start = time.perf_counter()
+        self.embedder.warm_up()
+        if self.store.count() > 0:
+            self.store.query(self.embedder.embed_text("warm up"), n_results=1)
+        print(f"Search engine warmed up in {time.perf_counter() - start:.2f}s")
+
+    def _backfill_lexical_index(self, batch_size=1000):
+        """Feed chunks that are already in the vector store into the lexical index, page by page."""
+        print("Building lexical index for existing chunks...")
+        offset = 0
+        while True:
+            with self._write_lock:
+                page = self.store.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+                if not page['ids']:
+                    break
+                self.lexical_index.add(
+                    page['ids'], page['documents'], [(m or {}).get('filename', '') for m in page['metadatas']]
+                )
+            offset += len(page['ids'])
+        self.config.set(lexical_index_complete=True)
+        self._bump_generation()
+        print(f"Lexical index ready ({offset} chunks).")
+
+    def cache_stats(self):
+        """Hit rates of the query embedding and search result caches."""
+        return {
+            "index_generation": self.index_generation,
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
+
     def get_stats(self):
-        return {"count": self.collection.count(), "path": self.db_path}
+        return {"count": self.store.count(), "path": self.db_path, "backend": self.store.name}
+
+    def set_search_ef(self, search_ef):
+        """ 
+        Trade HNSW query latency for recall on a Chroma index without rebuilding it 
+        (see benchmark_hnsw.py). Saved in the index config. 
+        """
+        if not hasattr(self.store, "set_search_ef"):
+            print(f"search_ef does not apply to the {self.store.name} store")
+            return False
+        with self._write_lock:
+            self.store.set_search_ef(search_ef)
+            self.config.set(hnsw_search_ef=search_ef)
+            self._bump_generation()
+        return True
+
+    def store_footprint(self):
+        """Chunks, disk and search memory of the vector store (comparable across backends)."""
+        return self.store.footprint()
 
     def get_all_ids(self):
+        """ 
+        Legacy full-collection scan of document IDs. 
+        Indexing uses self.manifest instead, which needs no collection reads. 
+        """
         try:
-            if self.collection.count() == 0:
+            if self.store.count() == 0:
                 return set()
-            result = self.collection.get(include=[])
+            result = self.store.get(include=[])
             all_server_ids = result['ids']
             file_ids = set()
             for sid in all_server_ids:
@@ -186,53 +499,169 @@ class VectorSearch:
             print(f"Error getting IDs: {e}")
             return set()
 
-    # --- UPDATED CLEAN LOGIC --- 
-    def clear_database(self):
+    def shutdown(self, timeout=15.0):
         """ 
-        Resets the database. Tries the official method first (Safe),  
-        then falls back to 'Nuclear' folder deletion if needed. 
+        Graceful stop: let a running indexing pipeline write every batch it has 
+        already embedded (each write is a manifest checkpoint), then return. 
+        Interrupted jobs resume from the manifest on the next start. 
         """
-        print("Resetting database...")
+        deadline = time.monotonic() + timeout
+        pipeline = self._active_pipeline
+        finished = True
+        if pipeline is not None:
+            print("Finishing in-flight index batches before exit...")
+            pipeline.drain()
+            finished = pipeline.wait(timeout)
+        # add_documents still discards half-written documents after the pipeline 
+        # returns; it holds the write lock until that is done 
+        if finished and self._write_lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._write_lock.release()
+        else:
+            finished = False
+        if not finished:
+            print(" Timed out waiting for the indexer; unfinished batches will be redone.")
+        self.embedder.close()
+        return finished
+
+    # -------------------- RECONCILIATION -------------------- 
+    def _delete_chunks(self, chunk_ids, batch_size=500):
+        for i in range(0, len(chunk_ids), batch_size):
+            self.store.delete(chunk_ids[i:i + batch_size])
+        self.lexical_index.delete(chunk_ids)
+        self._bump_generation()
 
-        # Method 1: The Official Way (Fast & Safe) 
+    def _discard_incomplete(self):
+        """Delete the chunks of this run's documents that were never recorded."""
+        incomplete = self.manifest.unrecorded_chunks(self._incomplete_docs)
+        self._incomplete_docs = set()
+        if not incomplete:
+            return 0
+        chunk_ids = [cid for ids in incomplete.values() for cid in ids]
         try:
-            self.client.reset()
-            print(" Database reset via client.reset()")
-            # Re-initialize collection hooks after reset 
-            self.collection = self.client.get_or_create_collection(
-                name="documents", metadata={"hnsw:space": "cosine"}
-            )
-            return True
+            self._delete_chunks(chunk_ids)
         except Exception as e:
-            print(f" Standard reset failed: {e}")
-            print(" Attempting nuclear folder deletion...")
+            print(f"Error deleting chunks of incomplete documents: {e}")
+            return 0
+        self.manifest.delete_documents(incomplete.keys())
+        print(f"Discarded {len(chunk_ids)} chunks of {len(incomplete)} incompletely indexed documents.")
+        return len(chunk_ids)
 
-        # Method 2: The Nuclear Way (If file locks persist) 
-        try:
-            # 1. Stop the internal system (Releases locks) 
-            if hasattr(self.client, '_system'):
-                self.client._system.stop()
+    def remove_paths(self, paths):
+        """Forget deleted or moved files and drop chunks no other copy still uses."""
+        with self._write_lock:
+            self.manifest.remove_paths(paths)
+            self.filename_index.remove(paths)
+            self._bump_generation()
+            return self.collect_garbage()
 
-            # 2. Kill references 
-            self.client = None
-            self.collection = None
-            gc.collect()
-            time.sleep(1.0)  # Wait for Windows to release handles 
+    def remove_unseen(self, folder, since):
+        """ 
+        Remove manifest entries under folder that a full scan started at `since` did 
+        not find (the scan stamps every file it sees in the manifest). 
+        """
+        missing = self.manifest.unseen_paths_under(folder, since)
+        if missing:
+            print(f"Removing {len(missing)} deleted/moved files from the index.")
+            return self.remove_paths(missing)
+        return 0
 
-            # 3. Delete folder 
-            if os.path.exists(self.db_path):
-                shutil.rmtree(self.db_path)
-                print(" Physical folder deleted.")
+    def collect_garbage(self, batch_size=500):
+        """ 
+        Delete chunks of documents no file references any more (superseded versions, 
+        deleted or moved files) and chunks of documents that were never recorded, 
+        one batch of documents at a time. 
 
-            # 4. Rebuild 
-            self._init_db()
-            return True
+        Returns: 
+            int: Number of chunks deleted 
+        """
+        deleted = 0
+        with self._write_lock:
+            for find in (self.manifest.orphaned_documents, self.manifest.untracked_documents):
+                while True:
+                    orphans = find(limit=batch_size)
+                    if not orphans:
+                        break
+                    chunk_ids = [cid for ids in orphans.values() for cid in ids]
+                    try:
+                        self._delete_chunks(chunk_ids, batch_size)
+                    except Exception as e:
+                        print(f"Error deleting stale chunks: {e}")
+                        break
+                    self.manifest.delete_documents(orphans.keys())
+                    deleted += len(chunk_ids)
 
-        except Exception as e:
-            print(f" Critical Error during hard clean: {e}")
-            # Last resort: Try to reconnect anyway so app doesn't crash 
-            try:
-                self._init_db()
-            except:
-                pass
-            return False
+        if deleted:
+            print(f"Garbage collected {deleted} stale chunks.")
+        return deleted
+
+    def reconcile(self, sweep_collection=False, batch_size=1000):
+        """ 
+        Incremental index reconciliation: 
+        1. Drop manifest entries whose file no longer exists (checked in batches). 
+        2. Garbage collect orphaned chunks. 
+        3. Sweep the collection for chunks the manifest never recorded (e.g. written 
+           before the manifest existed) when asked to, or when the health counts show 
+           more chunks in the store than the manifest references. 
+        """
+        removed = 0
+        for paths in self.manifest.iter_paths(batch_size):
+            missing = [p for p in paths if not os.path.exists(p)]
+            if missing:
+                self.manifest.remove_paths(missing)
+                self.filename_index.remove(missing)
+                removed += len(missing)
+        if removed:
+            print(f"Reconcile: {removed} indexed files no longer exist.")
+
+        self.collect_garbage()
+        health = self.index_health()
+        if sweep_collection or health["dead_chunks"]:
+            if self._sweep_unknown_chunks(batch_size):
+                health = self.index_health()
+        return health
+
+    def _sweep_unknown_chunks(self, batch_size=1000):
+        """Page through the collection and delete chunks whose document is not in the manifest."""
+        deleted = 0
+        offset = 0
+        with self._write_lock:
+            known = self.manifest.known_doc_ids()
+            while True:
+                page = self.store.get(limit=batch_size, offset=offset, include=[])['ids']
+                if not page:
+                    break
+                dead = [cid for cid in page if cid.split('_chunk_')[0] not in known]
+                if dead:
+                    self._delete_chunks(dead)
+                    deleted += len(dead)
+                offset += len(page) - len(dead)
+        if deleted:
+            print(f"Swept {deleted} chunks unknown to the manifest.")
+        return deleted
+
+    def index_health(self):
+        """Live vs. dead chunk report. Uses counts only, no full collection reads."""
+        health = self.manifest.health()
+        health["total_chunks"] = self.store.count()
+        health["dead_chunks"] = max(0, health["total_chunks"] - health["live_chunks"])
+        total = health["total_chunks"] or 1
+        health["dead_ratio"] = health["dead_chunks"] / total
+        print(f"Index health: {health['live_chunks']} live / {health['dead_chunks']} dead chunks "
+              f"({health['dead_ratio']:.1%} dead), {health['files']} files, "
+              f"{health['orphaned_documents']} orphaned documents")
+        return health
+
+    # --- UPDATED CLEAN LOGIC --- 
+    def clear_database(self):
+        """ 
+        Resets the database. The store tries its official reset first (Safe), 
+        then falls back to 'Nuclear' folder deletion if needed. 
+        """
+        print("Resetting database...")
+        self.manifest.clear()
+        self.lexical_index.clear()
+        self.filename_index.clear()
+        self._bump_generation()
+        ok = self.store.reset()
+        self._bump_generation()
+        return ok
@@ -0,0 +1,640 @@
+"""
+Vector Stores
+Where chunk vectors, text and metadata live. VectorSearch talks to a VectorStore
+only, so the backend is a per-index choice ("vector_store" in index_config.json):
+
+- ChromaStore: ChromaDB collection with an HNSW graph (approximate, the default)
+- FlatStore:   normalized vectors in a memory-mapped float32/float16 file, scored
+               exactly with one matrix product and argpartition. Exact recall, no
+               graph to load at startup, memory = chunks x dim x 2 or 4 bytes.
+- IVFPQStore:  FlatStore plus an inverted file of product-quantized codes (ivf_pq.py)
+               for multi-million-chunk corpora; full vectors stay on disk for re-ranking.
+- BinaryStore: FlatStore plus sign-bit codes scanned by Hamming distance, re-ranked
+               with the full vectors (binary_store.py).
+
+Every store uses cosine distance (1 - cosine similarity) and Chroma's `where`
+filter syntax.
+"""
+
+import os
+import gc
+import json
+import time
+import shutil
+import sqlite3
+import threading
+import numpy as np
+
+
+def directory_size(path):
+    """Bytes used by all files below path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class VectorStore:
+    """
+    Interface of a vector store. Results are plain dicts of parallel lists:
+    {'ids': [...], 'distances': [...], 'documents': [...], 'metadatas': [...],
+     'embeddings': [...]}, with only the requested fields present.
+    """
+    name = None
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def query(self, embedding, n_results=10, where=None):
+        """Nearest chunks to one query vector, closest first."""
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=("documents", "metadatas")):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def reset(self):
+        """Delete every chunk. Returns True on success."""
+        raise NotImplementedError
+
+    def footprint(self):
+        """Size report (chunks, bytes on disk, bytes held in memory for search)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# ==========================================
+# CHROMA (HNSW)
+# ==========================================
+class ChromaStore(VectorStore):
+    name = "chroma"
+    COLLECTION = "documents"
+    # Our setting names -> Chroma's HNSW configuration keys
+    HNSW_KEYS = {"M": "max_neighbors", "construction_ef": "ef_construction", "search_ef": "ef_search"}
+
+    def __init__(self, path, hnsw=None):
+        """
+        Args:
+            path (str): Folder of the Chroma database
+            hnsw (dict): M, construction_ef, search_ef (None entries keep Chroma's defaults).
+                M and construction_ef only apply when the collection is created;
+                search_ef is applied to existing collections too.
+        """
+        self.hnsw = {k: v for k, v in (hnsw or {}).items() if v is not None}
+        self._rebuild_notice = True
+        # Imported here so an index on another backend does not pay for loading Chroma
+        import chromadb
+        from chromadb.config import Settings  # <--- Essential for Reset Permission
+        self._chromadb = chromadb
+        self._settings = Settings
+        self.path = path
+        self._open()
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.client = self._chromadb.PersistentClient(
+            path=self.path,
+            settings=self._settings(allow_reset=True)  # <--- THIS FIXES THE LOCK
+        )
+        self.collection = self._create_collection()
+
+    def _create_collection(self):
+        hnsw = {"space": "cosine"}
+        hnsw.update({self.HNSW_KEYS[k]: v for k, v in self.hnsw.items()})
+        collection = self.client.get_or_create_collection(
+            name=self.COLLECTION,
+            configuration={"hnsw": hnsw}
+        )
+
+        # An existing collection keeps the graph it was built with
+        current = self._hnsw_settings(collection)
+        for key in ("M", "construction_ef"):
+            if self._rebuild_notice and key in self.hnsw and self.hnsw[key] != current[key]:
+                print(f"HNSW {key}={current[key]} in the existing index; "
+                      f"{key}={self.hnsw[key]} applies after clearing it")
+        self._rebuild_notice = False
+        if "search_ef" in self.hnsw and self.hnsw["search_ef"] != current["search_ef"]:
+            collection.modify(configuration={"hnsw": {"ef_search": self.hnsw["search_ef"]}})
+        return collection
+
+    def _hnsw_settings(self, collection):
+        config = (collection.configuration or {}).get("hnsw") or {}
+        return {key: config.get(chroma_key) for key, chroma_key in self.HNSW_KEYS.items()}
+
+    def hnsw_settings(self):
+        """HNSW parameters of the collection as built (M, construction_ef) and queried (search_ef)."""
+        return self._hnsw_settings(self.collection)
+
+    def set_search_ef(self, search_ef):
+        """Candidate list size of HNSW queries: higher is slower with better recall. Persisted by Chroma."""
+        self.hnsw["search_ef"] = search_ef
+        self.collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+        # A loaded HNSW index keeps the settings it was loaded with: reopen the client
+        # (a fraction of a second; queries running meanwhile fail and return nothing)
+        if hasattr(self.client, '_system'):
+            self.client._system.stop()
+        self._chromadb.api.client.SharedSystemClient.clear_system_cache()
+        self._open()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(
+            ids=list(ids),
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist()
+        )
+
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+
+    def query(self, embedding, n_results=10, where=None):
+        result = self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=n_results,
+            where=where
+        )
+        if not result['ids']:
+            return {'ids': [], 'distances': [], 'documents': [], 'metadatas': []}
+        return {key: result[key][0] for key in ('ids', 'distances', 'documents', 'metadatas')}
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=("documents", "metadatas")):
+        result = self.collection.get(
+            ids=list(ids) if ids is not None else None, where=where,
+            limit=limit, offset=offset or None, include=list(include)
+        )
+        return {key: result[key] for key in ('ids', *include)}
+
+    def count(self):
+        return self.collection.count()
+
+    def reset(self):
+        """
+        Tries the official method first (Safe), then falls back to 'Nuclear'
+        folder deletion if needed.
+        """
+        # Method 1: The Official Way (Fast & Safe)
+        try:
+            self.client.reset()
+            print(" Database reset via client.reset()")
+            # Re-initialize collection hooks after reset
+            self.collection = self._create_collection()
+            return True
+        except Exception as e:
+            print(f" Standard reset failed: {e}")
+            print(" Attempting nuclear folder deletion...")
+
+        # Method 2: The Nuclear Way (If file locks persist)
+        try:
+            # 1. Stop the internal system (Releases locks)
+            if hasattr(self.client, '_system'):
+                self.client._system.stop()
+
+            # 2. Kill references
+            self.client = None
+            self.collection = None
+            gc.collect()
+            time.sleep(1.0)  # Wait for Windows to release handles
+
+            # 3. Delete folder
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+                print(" Physical folder deleted.")
+
+            # 4. Rebuild
+            self._open()
+            return True
+
+        except Exception as e:
+            print(f" Critical Error during hard clean: {e}")
+            # Last resort: Try to reconnect anyway so app doesn't crash
+            try:
+                self._open()
+            except:
+                pass
+            return False
+
+    def footprint(self):
+        count = self.count()
+        disk = directory_size(self.path)
+        return {
+            "backend": self.name,
+            "chunks": count,
+            "disk_bytes": disk,
+            # The HNSW segment folders (vectors + graph) are loaded into RAM in full
+            "memory_bytes": sum(directory_size(os.path.join(self.path, d)) for d in os.listdir(self.path)
+                                if os.path.isdir(os.path.join(self.path, d))),
+            **self.hnsw_settings(),
+        }
+
+
+# ==========================================
+# FLAT (EXACT, MEMORY-MAPPED)
+# ==========================================
+_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def where_to_sql(where):
+    """
+    Translate a Chroma `where` filter into a SQL condition on the JSON metadata
+    column. Supports field equality, $eq/$ne/$gt/$gte/$lt/$lte/$in/$nin, $and, $or.
+
+    Returns:
+        tuple: (sql, params)
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(w) for w in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(f"({sql})" for sql, _ in parts) + ")")
+            for _, p in parts:
+                params.extend(p)
+            continue
+
+        field = "json_extract(metadata, ?)"
+        path = '$."' + key.replace('"', '""') + '"'
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in ("$in", "$nin"):
+                placeholders = ",".join("?" * len(value)) or "NULL"
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"{field} {negate}IN ({placeholders})")
+                params.extend([path, *value])
+            elif op in _OPERATORS:
+                clauses.append(f"{field} {_OPERATORS[op]} ?")
+                params.extend([path, value])
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return " AND ".join(clauses) or "1", params
+
+
+class FlatStore(VectorStore):
+    """
+    Exact nearest neighbours over a memory-mapped matrix.
+
+    Files (in `path`):
+    - vectors.f32 / vectors.f16: one normalized vector per row; grows by doubling
+    - rows.db: row -> chunk id, text and metadata (SQLite)
+
+    Deleted rows are reused by later inserts. Queries score every live row, so
+    latency grows linearly with the corpus (up to about 1M chunks). float16 halves
+    memory, but each block is widened to float32 before the product, which makes
+    scans several times slower on CPUs.
+    """
+    name = "flat"
+    DTYPES = {"float32": ("f32", np.float32), "float16": ("f16", np.float16)}
+    # Rows scored per matrix product (bounds the float32 copy of float16 blocks)
+    BLOCK_ROWS = 65536
+
+    def __init__(self, path, dtype="float32", initial_capacity=4096):
+        """
+        Args:
+            path (str): Folder holding the vector file and the row database
+            dtype (str): 'float32' or 'float16' for a new store; an existing store keeps its own
+            initial_capacity (int): Rows allocated up front
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.initial_capacity = initial_capacity
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, 'rows.db'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+        self.dtype = meta.get("dtype", dtype)
+        if self.dtype not in self.DTYPES:
+            raise ValueError(f"Unknown flat store dtype: {self.dtype}")
+        suffix, self._np_dtype = self.DTYPES[self.dtype]
+        self.vectors_path = os.path.join(path, f'vectors.{suffix}')
+
+        self.dim = None
+        self.capacity = 0
+        self._vectors = None
+        self._live = np.zeros(0, dtype=bool)
+        self._high = 0  # one past the highest row in use
+        if "dim" in meta and os.path.exists(self.vectors_path):
+            self._open(int(meta["dim"]))
+        else:
+            self._conn.execute("DELETE FROM rows")
+            self._conn.commit()
+
+    # -------------------- STORAGE --------------------
+    def _open(self, dim):
+        self.dim = dim
+        row_bytes = dim * np.dtype(self._np_dtype).itemsize
+        self.capacity = os.path.getsize(self.vectors_path) // row_bytes
+        self._vectors = np.memmap(self.vectors_path, dtype=self._np_dtype, mode='r+',
+                                  shape=(self.capacity, dim)) if self.capacity else None
+        rows = np.fromiter((r for (r,) in self._conn.execute("SELECT row FROM rows")), dtype=np.int64)
+        rows = rows[rows < self.capacity]
+        self._live = np.zeros(self.capacity, dtype=bool)
+        self._live[rows] = True
+        self._high = int(rows.max()) + 1 if len(rows) else 0
+
+    def _resize(self, capacity):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(capacity * self.dim * np.dtype(self._np_dtype).itemsize)
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live[:capacity]
+        self._live = live
+        self.capacity = capacity
+        self._vectors = np.memmap(self.vectors_path, dtype=self._np_dtype, mode='r+',
+                                  shape=(capacity, self.dim))
+
+    def _init_dim(self, dim):
+        self._conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                               [("dim", str(dim)), ("dtype", self.dtype)])
+        self._conn.commit()
+        self.dim = dim
+        self._live = np.zeros(0, dtype=bool)
+        self._high = 0
+        self._resize(self.initial_capacity)
+
+    def _rows_for_ids(self, ids):
+        found = {}
+        for i in range(0, len(ids), 500):
+            part = list(ids[i:i + 500])
+            placeholders = ",".join("?" * len(part))
+            found.update(self._conn.execute(
+                f"SELECT id, row FROM rows WHERE id IN ({placeholders})", part
+            ).fetchall())
+        return found
+
+    def _allocate(self, needed):
+        free = np.flatnonzero(~self._live[:self._high])[:needed].tolist()
+        if len(free) < needed:
+            start = self._high
+            end = start + needed - len(free)
+            if end > self.capacity:
+                capacity = max(self.capacity, self.initial_capacity)
+                while capacity < end:
+                    capacity *= 2
+                self._resize(capacity)
+            free.extend(range(start, end))
+        return free
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # -------------------- UPDATES --------------------
+    def upsert(self, ids, embeddings, documents, metadatas):
+        ids = list(ids)
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            if self.dim is None:
+                self._init_dim(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match the store ({self.dim})")
+
+            rows = self._rows_for_ids(ids)
+            new_ids = list(dict.fromkeys(i for i in ids if i not in rows))
+            rows.update(zip(new_ids, self._allocate(len(new_ids))))
+
+            targets = np.array([rows[i] for i in ids], dtype=np.int64)
+            self._vectors[targets] = vectors.astype(self._np_dtype)
+            self._vectors.flush()
+            self._live[targets] = True
+            self._high = max(self._high, int(targets.max()) + 1)
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(rows[i], i, d, json.dumps(m) if m is not None else None)
+                     for i, d, m in zip(ids, documents, metadatas)]
+                )
+            self._after_write(targets, vectors)
+
+    def _after_write(self, rows, vectors):
+        """Hook for stores that keep derived data per row (e.g. compressed codes)."""
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            rows = self._rows_for_ids(ids)
+            if not rows:
+                return
+            with self._conn:
+                self._conn.executemany("DELETE FROM rows WHERE row = ?", [(r,) for r in rows.values()])
+            self._live[list(rows.values())] = False
+
+    def reset(self):
+        with self._lock:
+            self._vectors = None
+            gc.collect()
+            with self._conn:
+                self._conn.execute("DELETE FROM rows")
+                self._conn.execute("DELETE FROM meta")
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+            self.dim = None
+            self.capacity = 0
+            self._live = np.zeros(0, dtype=bool)
+            self._high = 0
+        print(" Flat vector store cleared")
+        return True
+
+    # -------------------- QUERIES --------------------
+    def _filtered_rows(self, where):
+        sql, params = where_to_sql(where)
+        return np.fromiter(
+            (r for (r,) in self._conn.execute(f"SELECT row FROM rows WHERE {sql}", params)), dtype=np.int64
+        )
+
+    def _score(self, q, rows=None):
+        """Cosine similarity of q with every live row (or the given rows)."""
+        if rows is not None:
+            return self._vectors[rows].astype(np.float32) @ q
+        scores = np.empty(self._high, dtype=np.float32)
+        for start in range(0, self._high, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, self._high)
+            block = self._vectors[start:end]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores[start:end] = block @ q
+        scores[~self._live[:self._high]] = -np.inf
+        return scores
+
+    def query(self, embedding, n_results=10, where=None):
+        q = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            if self._vectors is None or self._high == 0:
+                return self._result([], [])
+            if where:
+                rows = self._filtered_rows(where)
+                scores = self._score(q, rows)
+            else:
+                rows = None
+                scores = self._score(q)
+                valid = int(self._live[:self._high].sum())
+                n_results = min(n_results, valid)
+
+            k = min(n_results, len(scores))
+            if k <= 0:
+                return self._result([], [])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return self._result(rows[top] if rows is not None else top, scores[top])
+
+    def _rerank(self, q, candidates, n_results):
+        """Exact top-k among candidate rows of an approximate first pass."""
+        candidates = np.sort(candidates)  # sequential reads of the vector file
+        exact = np.asarray(self._vectors[candidates], dtype=np.float32) @ q
+        k = min(n_results, len(candidates))
+        if k <= 0:
+            return self._result([], [])
+        top = np.argpartition(-exact, k - 1)[:k]
+        top = top[np.argsort(-exact[top], kind='stable')]
+        return self._result(candidates[top], exact[top])
+
+    def _result(self, rows, scores):
+        """Query result for rows (best first) and their cosine similarities."""
+        rows = [int(r) for r in rows]
+        records = self._records(rows)
+        result = {'ids': [], 'distances': [], 'documents': [], 'metadatas': []}
+        for row, score in zip(rows, scores):
+            chunk_id, document, metadata = records[row]
+            result['ids'].append(chunk_id)
+            result['distances'].append(1.0 - float(score))
+            result['documents'].append(document)
+            result['metadatas'].append(metadata)
+        return result
+
+    def _records(self, rows):
+        records = {}
+        for i in range(0, len(rows), 500):
+            part = rows[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            for row, chunk_id, document, metadata in self._conn.execute(
+                f"SELECT row, id, document, metadata FROM rows WHERE row IN ({placeholders})", part
+            ):
+                records[row] = (chunk_id, document, json.loads(metadata) if metadata else None)
+        return records
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=("documents", "metadatas")):
+        conditions, params = [], []
+        if where:
+            sql, where_params = where_to_sql(where)
+            conditions.append(sql)
+            params.extend(where_params)
+
+        with self._lock:
+            if ids is not None:
+                rows = list(self._rows_for_ids(list(ids)).values())
+                if not rows:
+                    return {key: [] for key in ('ids', *include)}
+                conditions.append(f"row IN ({','.join('?' * len(rows))})")
+                params.extend(rows)
+            sql = "SELECT row, id, document, metadata FROM rows"
+            if conditions:
+                sql += " WHERE " + " AND ".join(f"({c})" for c in conditions)
+            sql += " ORDER BY row"
+            if limit is not None or offset:
+                sql += " LIMIT ? OFFSET ?"
+                params.extend([-1 if limit is None else limit, offset or 0])
+            records = self._conn.execute(sql, params).fetchall()
+
+            result = {'ids': [chunk_id for _, chunk_id, _, _ in records]}
+            if "documents" in include:
+                result['documents'] = [document for _, _, document, _ in records]
+            if "metadatas" in include:
+                result['metadatas'] = [json.loads(m) if m else None for _, _, _, m in records]
+            if "embeddings" in include:
+                rows = np.array([row for row, _, _, _ in records], dtype=np.int64)
+                result['embeddings'] = (self._vectors[rows].astype(np.float32) if len(rows)
+                                        else np.empty((0, self.dim or 0), dtype=np.float32))
+        return result
+
+    def count(self):
+        with self._lock:
+            return int(self._live[:self._high].sum())
+
+    def footprint(self):
+        with self._lock:
+            itemsize = np.dtype(self._np_dtype).itemsize
+            return {
+                "backend": self.name,
+                "chunks": self.count(),
+                "dim": self.dim,
+                "dtype": self.dtype,
+                "disk_bytes": directory_size(self.path),
+                # Pages of the vector file touched by a full scan
+                "memory_bytes": self._high * (self.dim or 0) * itemsize + self.capacity,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._conn.close()
+
+
+# ==========================================
+# FACTORY
+# ==========================================
+STORES = ("chroma", "flat", "ivfpq", "binary")
+
+
+def open_vector_store(kind, data_dir, **options):
+    """
+    Open the store of an index.
+
+    Args:
+        kind (str): 'chroma', 'flat', 'ivfpq' or 'binary'
+        data_dir (str): Index folder; each backend uses its own subfolder
+        options: Backend settings (chroma: hnsw_m, hnsw_construction_ef, hnsw_search_ef;
+                 flat: dtype; ivfpq: dtype, nprobe, pq_m, rerank; binary: dtype, binary_rerank)
+    """
+    if kind == "chroma":
+        hnsw = {"M": options.get("hnsw_m"), "construction_ef": options.get("hnsw_construction_ef"),
+                "search_ef": options.get("hnsw_search_ef")}
+        return ChromaStore(os.path.join(data_dir, 'chroma_db'), hnsw=hnsw)
+    if kind == "flat":
+        return FlatStore(os.path.join(data_dir, 'flat_store'), dtype=options.get("dtype") or "float32")
+    if kind == "ivfpq":
+        from search_engine.ivf_pq import IVFPQStore
+        settings = {k: v for k, v in options.items() if k in ("nprobe", "pq_m", "rerank") and v is not None}
+        return IVFPQStore(os.path.join(data_dir, 'ivfpq_store'), dtype=options.get("dtype") or "float32", **settings)
+    if kind == "binary":
+        from search_engine.binary_store import BinaryStore
+        return BinaryStore(os.path.join(data_dir, 'binary_store'), dtype=options.get("dtype") or "float32",
+                           rerank=options.get("binary_rerank") or 300)
+    raise ValueError(f"Unknown vector store: {kind} (choose from {', '.join(STORES)})")
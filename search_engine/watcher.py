@@ -0,0 +1,467 @@
+"""
+Folder Watcher
+Keeps indexed folders fresh without full rescans. Uses inotify on Linux and falls
+back to periodic polling elsewhere. Events are debounced and coalesced into small
+incremental index / delete batches.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from search_engine.file_indexer import FileIndexer
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+CHANGED = "changed"
+DELETED = "deleted"
+
+
+class _Inotify:
+    """Minimal ctypes binding for the Linux inotify API."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        """Remove a watch; already-gone watches (deleted folders) are ignored."""
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        """Yield (wd, mask, name) tuples, waiting up to timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class FolderWatcher:
+    def __init__(self, on_changes, on_rescan=None, should_watch=None,
+                 debounce=2.0, max_delay=10.0, poll_interval=60.0, max_batch=500):
+        """
+        Initialize the watcher.
+
+        Args:
+            on_changes (callable): on_changes(changed_paths, deleted_paths), called from a
+                dispatcher thread with coalesced batches
+            on_rescan (callable): on_rescan(root) when events were lost (queue overflow)
+            should_watch (callable): directory filter, e.g. FileIndexer._should_skip_folder inverted
+            debounce (float): Seconds of quiet before a batch is dispatched
+            max_delay (float): Dispatch anyway after this many seconds of continuous events
+            poll_interval (float): Seconds between scans in polling mode
+            max_batch (int): Maximum paths per dispatched batch
+        """
+        self.on_changes = on_changes
+        self.on_rescan = on_rescan
+        self.should_watch = should_watch or (lambda path: True)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.max_batch = max_batch
+
+        self.roots = set()
+        self.backend = None
+        self._new_roots = []
+
+        self._pending = {}
+        self._first_event = None
+        self._last_event = None
+        self._rescan_roots = set()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+        # inotify state (the maps are shared with clear_roots, hence the lock)
+        self._inotify = None
+        self._wd_to_dir = {}
+        self._dir_to_wd = {}
+        self._watch_lock = threading.Lock()
+        self._watch_generation = 0  # bumped by clear_roots; stops tree walks in progress
+
+        # polling state
+        self._snapshots = {}
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self, roots=()):
+        if self._threads:
+            return
+        self._stop.clear()
+
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+                self.backend = "inotify"
+            except Exception as e:
+                print(f" inotify unavailable, using polling: {e}")
+        if self._inotify is None:
+            self.backend = "polling"
+
+        for root in roots:
+            self.add_root(root)
+
+        reader = self._inotify_loop if self._inotify else self._poll_loop
+        self._threads = [
+            threading.Thread(target=reader, daemon=True),
+            threading.Thread(target=self._dispatch_loop, daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        print(f"Folder watcher started ({self.backend}) on {len(self.roots)} folder(s).")
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+        self._wd_to_dir.clear()
+        self._dir_to_wd.clear()
+
+    def add_root(self, root):
+        """Watch a folder. The initial tree walk happens on the watcher thread."""
+        root = os.path.abspath(root)
+        with self._cond:
+            if root in self.roots:
+                return
+            self.roots.add(root)
+            self._new_roots.append(root)
+
+    def clear_roots(self):
+        with self._cond:
+            self.roots.clear()
+            self._new_roots.clear()
+        self._snapshots.clear()
+        with self._watch_lock:
+            self._watch_generation += 1
+            # Release the kernel watches too: they count against max_user_watches
+            if self._inotify:
+                for wd in self._wd_to_dir:
+                    self._inotify.rm_watch(wd)
+            self._wd_to_dir.clear()
+            self._dir_to_wd.clear()
+
+    def _take_new_roots(self):
+        with self._cond:
+            roots, self._new_roots = self._new_roots, []
+        return [r for r in roots if os.path.isdir(r)]
+
+    # -------------------- EVENT COALESCING --------------------
+    def _record(self, path, kind):
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            # Last event wins: create+delete -> deleted, delete+create -> changed
+            self._pending[path] = kind
+            self._cond.notify_all()
+
+    def _request_rescan(self, root):
+        with self._cond:
+            self._rescan_roots.add(root)
+            self._cond.notify_all()
+
+    def _dispatch_loop(self):
+        """Waits for a quiet period, then hands one coalesced batch to on_changes."""
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._stop.is_set():
+                    if self._rescan_roots:
+                        break
+                    if self._pending:
+                        now = time.monotonic()
+                        quiet = now - self._last_event >= self.debounce
+                        overdue = now - self._first_event >= self.max_delay
+                        if quiet or overdue or len(self._pending) >= self.max_batch:
+                            break
+                        self._cond.wait(timeout=self.debounce / 4)
+                    else:
+                        self._cond.wait(timeout=1.0)
+                if self._stop.is_set():
+                    return
+
+                rescans, self._rescan_roots = self._rescan_roots, set()
+                items = list(self._pending.items())[:self.max_batch]
+                for path, _ in items:
+                    del self._pending[path]
+                if self._pending:
+                    self._first_event = time.monotonic()
+
+            for root in rescans:
+                if self.on_rescan:
+                    try:
+                        self.on_rescan(root)
+                    except Exception as e:
+                        print(f"Watcher rescan error: {e}")
+
+            if items:
+                changed = [p for p, kind in items if kind == CHANGED]
+                deleted = [p for p, kind in items if kind == DELETED]
+                try:
+                    self.on_changes(changed, deleted)
+                except Exception as e:
+                    print(f"Watcher update error: {e}")
+
+    # -------------------- INOTIFY BACKEND --------------------
+    def _watch_tree(self, root, report_files=False):
+        """Add watches for a directory and its subdirectories."""
+        generation = self._watch_generation
+        stack = [root]
+        while stack:
+            folder = stack.pop()
+            if folder != root and not self.should_watch(folder):
+                continue
+            with self._watch_lock:
+                if self._watch_generation != generation:
+                    return  # roots were cleared meanwhile
+                try:
+                    wd = self._inotify.add_watch(folder)
+                except OSError as e:
+                    if e.errno == errno.ENOSPC:
+                        print(" inotify watch limit reached (fs.inotify.max_user_watches); "
+                              "falling back to polling for new folders.")
+                    continue
+                self._wd_to_dir[wd] = folder
+                self._dir_to_wd[folder] = wd
+
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif report_files:
+                            # Files created before the watch was in place
+                            self._record(entry.path, CHANGED)
+            except OSError:
+                continue
+
+    def _forget_tree(self, folder):
+        prefix = os.path.join(folder, "")
+        with self._watch_lock:
+            for path in [d for d in self._dir_to_wd if d == folder or d.startswith(prefix)]:
+                wd = self._dir_to_wd.pop(path)
+                self._wd_to_dir.pop(wd, None)
+                # A folder moved out of the tree keeps its watch until removed
+                self._inotify.rm_watch(wd)
+
+    def _inotify_loop(self):
+        while not self._stop.is_set():
+            for root in self._take_new_roots():
+                self._watch_tree(root)
+
+            try:
+                events = list(self._inotify.read_events(timeout=0.5))
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"Watcher read error: {e}")
+                return
+
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # Kernel queue overflowed: events were lost, rescan everything
+                    for root in list(self.roots):
+                        self._request_rescan(root)
+                    continue
+
+                folder = self._wd_to_dir.get(wd)
+                if folder is None:
+                    continue
+
+                if mask & IN_IGNORED:
+                    with self._watch_lock:
+                        self._wd_to_dir.pop(wd, None)
+                        self._dir_to_wd.pop(folder, None)
+                    continue
+
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    continue  # reported by the parent's DELETE / MOVED_FROM event
+
+                path = os.path.join(folder, name) if name else folder
+
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(path, report_files=True)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._forget_tree(path)
+                        self._record(path, DELETED)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._record(path, DELETED)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY | IN_ATTRIB):
+                    self._record(path, CHANGED)
+
+    # -------------------- POLLING BACKEND --------------------
+    def _snapshot(self, root):
+        """Map every file under root to (size, mtime_ns)."""
+        state = {}
+        stack = [root]
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if self.should_watch(entry.path):
+                                    stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                state[entry.path] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return state
+
+    def _poll_loop(self):
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stop.wait(1.0):
+            for root in self._take_new_roots():
+                self._snapshots[root] = self._snapshot(root)
+
+            if time.monotonic() < next_poll:
+                continue
+            next_poll = time.monotonic() + self.poll_interval
+
+            for root in list(self.roots):
+                if root not in self._snapshots:
+                    continue
+                old = self._snapshots.get(root, {})
+                new = self._snapshot(root)
+                self._snapshots[root] = new
+
+                for path, state in new.items():
+                    if old.get(path) != state:
+                        self._record(path, CHANGED)
+                for path in old:
+                    if path not in new:
+                        self._record(path, DELETED)
+
+
+class IndexWatcher:
+    def __init__(self, vector_search, file_indexer=None, debounce=2.0, poll_interval=60.0):
+        """
+        Connects a FolderWatcher to the indexer: changed files are re-indexed and
+        deleted ones removed through VectorSearch, a few at a time.
+        The watcher runs alongside manual indexing, so it owns its FileIndexer (whose
+        per-run state, e.g. scan_counts, would otherwise be shared). Its extraction
+        pools are kept between batches instead of being started for every few files.
+        """
+        self.vector_search = vector_search
+        self.file_indexer = file_indexer or FileIndexer(keep_pools=True)
+        self.watcher = FolderWatcher(
+            on_changes=self._apply_changes,
+            on_rescan=self._rescan,
+            should_watch=lambda folder: not self.file_indexer._should_skip_folder(folder),
+            debounce=debounce,
+            poll_interval=poll_interval
+        )
+
+    def start(self):
+        self.watcher.start(self.vector_search.manifest.get_roots())
+
+    def stop(self):
+        self.watcher.stop()
+        self.file_indexer.close()
+
+    def add_root(self, folder):
+        self.vector_search.manifest.add_root(folder)
+        self.watcher.add_root(folder)
+
+    def clear_roots(self):
+        self.vector_search.manifest.clear_roots()
+        self.watcher.clear_roots()
+
+    def _apply_changes(self, changed, deleted):
+        manifest = self.vector_search.manifest
+
+        # Index first: a moved file's new path then still finds its content in the
+        # manifest and is recorded as a reference, before the old path is removed
+        files = [p for p in changed
+                 if self.file_indexer.is_indexable(p, self._root_for(p)) and os.path.isfile(p)]
+        if files:
+            print(f"Watcher: re-indexing {len(files)} changed file(s), removing {len(deleted)} path(s).")
+            self.vector_search.add_documents(self.file_indexer.process_files(files, manifest=manifest))
+
+        # A deleted directory removes everything indexed beneath it (but not what was
+        # created there again since, and was just indexed)
+        gone = []
+        for path in deleted:
+            gone.append(path)
+            gone.extend(manifest.paths_under(path))
+        gone = [p for p in gone if not os.path.exists(p)]
+        if gone:
+            self.vector_search.remove_paths(gone)
+
+    def _root_for(self, path):
+        for root in self.watcher.roots:
+            if path.startswith(os.path.join(root, "")):
+                return root
+        return None
+
+    def _rescan(self, root):
+        print(f"Watcher: events lost, rescanning {root}")
+        started = time.time()
+        self.vector_search.add_documents(self.file_indexer.process_files(
+            self.file_indexer.scan_directory_iter(root), manifest=self.vector_search.manifest
+        ))
+        # An aborted or partial walk never stamped the files it missed
+        if self.file_indexer.last_scan_complete:
+            self.vector_search.remove_unseen(root, started)
@@ -1,7 +1,8 @@
-import hashlib
 import os
 import sys
+import time
 import threading
+from collections import deque
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
@@ -9,6 +10,9 @@ from PIL import Image
 
 from search_engine.vector_search import VectorSearch
 from search_engine.file_indexer import FileIndexer
+from search_engine.watcher import IndexWatcher
+from search_engine.scheduler import IndexScheduler
+from ui.search_worker import SearchWorker
 from utils.open_file import open_file
 
 # -------------------- THEME -------------------- 
@@ -91,14 +95,109 @@ class SearchWindow:
     WIDTH = 800
     INITIAL_HEIGHT = 160
     MAX_HEIGHT = 700
+    DEBOUNCE_MS = 150       # Pause in typing before an incremental search starts 
+    MIN_QUERY_CHARS = 2     # Shorter input only searches on Enter 
+    FILENAME_HITS = 5       # Instant filename matches kept above content results 
 
     def __init__(self):
         self.root = None
-        self.vector_search = VectorSearch()
         self.file_indexer = FileIndexer()
+
+        # Recently modified files are indexed (and searchable) first 
+        self.scheduler = IndexScheduler(policy='recent')
+
+        # The model and database load in the background so the window opens at once 
+        self.vector_search = None
+        self.index_watcher = None
+        self.engine_state = "loading"  # loading -> ready | failed 
+        self.index_health = None  # Last live/dead chunk counts, shown next to "Ready" 
+        self._engine_ready = threading.Event()
+        self._engine_announced = False
+        self._pending_query = None
+
         self.results = []
         self.selected_index = -1
 
+        # Search-as-you-type: one worker, only the latest query pending 
+        self.search_worker = SearchWorker(self._run_search, self._on_search_result)
+        self._debounce_id = None
+        self._keystroke_time = None
+        self.search_latencies = deque(maxlen=100)  # Keystroke-to-render, seconds 
+
+        self._indexing = False
+        self._closing = False
+        self._resume_queue = deque()  # Interrupted folders waiting to be resumed, in job order 
+
+        threading.Thread(target=self._load_engine, daemon=True).start()
+
+    # -------------------- ENGINE LOADING -------------------- 
+    def _load_engine(self):
+        try:
+            vector_search = VectorSearch()
+            # Pay the first-inference cost now instead of on the first search 
+            vector_search.warm_up()
+
+            # Keeps previously indexed folders up to date in the background 
+            self.index_watcher = IndexWatcher(vector_search)
+            self.index_watcher.start()
+
+            self.vector_search = vector_search
+            self.engine_state = "ready"
+        except Exception as e:
+            print(f"Failed to load search engine: {e}")
+            self.engine_state = "failed"
+        self._engine_ready.set()
+
+        if self.root:
+            self.root.after(0, self._on_engine_ready)
+
+        if self.engine_state == "ready":
+            self._reconcile_index()
+
+    def _reconcile_index(self):
+        """Drop files deleted while the app was closed, collect dead chunks, report health."""
+        try:
+            self.index_health = self.vector_search.reconcile()
+        except Exception as e:
+            print(f"Reconcile error: {e}")
+            return
+        if self.root:
+            self.root.after(0, self._show_ready)
+
+    def _ready_text(self):
+        health = self.index_health
+        if not health:
+            return "Ready"
+        text = f"Ready · {health['files']} files, {health['live_chunks']} chunks indexed"
+        if health["dead_chunks"]:
+            text += f" ({health['dead_ratio']:.0%} stale)"
+        return text
+
+    def _show_ready(self):
+        """Show the idle status, unless a search or indexing run owns the footer."""
+        if self._indexing or self.query.get().strip():
+            return
+        self.status.configure(text=self._ready_text())
+
+    def _on_engine_ready(self):
+        if self._engine_announced:
+            return
+        self._engine_announced = True
+        if self.engine_state != "ready":
+            self.status.configure(text="Search engine failed to load. See console for details.")
+            return
+
+        self.status.configure(text=self._ready_text())
+
+        # Pick up indexing runs that were interrupted by a close or reboot 
+        self._resume_interrupted_jobs()
+
+        if self._pending_query:
+            query, self._pending_query = self._pending_query, None
+            self._search(query)
+        else:
+            self._check_empty_db()
+
     # -------------------- WINDOW LOGIC -------------------- 
     def toggle_window(self):
         if not self.root:
@@ -116,7 +215,7 @@ class SearchWindow:
             self.root.lift()
             self.root.focus_force()
             self.search_entry.focus_set()
-        self.root.after(400, self._check_empty_db)
+            self.root.after(400, self._check_empty_db)
 
     def _create_window(self):
         self.root = ctk.CTk()
@@ -143,11 +242,30 @@ class SearchWindow:
         # --- IMPORTANT CHANGE: Fully close the app on exit --- 
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
+        if self._engine_ready.is_set():
+            # Engine finished loading before the window existed 
+            self.root.after(0, self._on_engine_ready)
+        else:
+            self.status.configure(text="Loading search engine...")
+
     def _on_close(self):
         """ 
         Handles the window close event. 
-        Destroys the window and forces the python process to exit. 
+        Lets a running index write its in-flight batches (a durable checkpoint), 
+        destroys the window and forces the python process to exit. 
         """
+        self._closing = True
+        try:
+            if self.root:
+                self.root.withdraw()  # Disappear immediately while the indexer drains 
+            self.search_worker.stop()
+            if self.index_watcher:
+                self.index_watcher.stop()
+            if self.vector_search:
+                self.vector_search.shutdown(timeout=15.0)
+        except Exception as e:
+            print(f"Error stopping indexer: {e}")
+
         try:
             if self.root:
                 self.root.quit()    # Stops the main loop 
@@ -186,6 +304,7 @@ class SearchWindow:
         )
         self.search_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
         self.search_entry.focus()
+        self.query.trace_add("write", self._on_query_changed)
 
         # --- NEW: Submit Button --- 
         self.btn_search = ctk.CTkButton(
@@ -201,36 +320,101 @@ class SearchWindow:
 
     # -------------------- SEARCH TRIGGER -------------------- 
     def _on_search_click(self):
+        self._cancel_debounce()
         q = self.query.get().strip()
         if not q:
             self.status.configure(text="Please enter a search term.")
             return
-        self._search(q)
+        self._search(q, started=self._keystroke_time or time.perf_counter())
 
-    # -------------------- SEARCH EXECUTION -------------------- 
-    def _search(self, query):
-        self.status.configure(text="Searching...")
+    def _on_query_changed(self, *_):
+        """Restart the debounce timer on every keystroke."""
+        self._keystroke_time = time.perf_counter()
+        self._cancel_debounce()
+        # Results of an in-flight search are for an older query: drop them
+        self.search_worker.cancel()
 
-        def task():
-            # 1. Fetch more results than needed (e.g., 50) to allow for filtering 
-            raw_results = self.vector_search.search(query, top_k=50)
+        q = self.query.get().strip()
+        if not q:
+            self._render_results([])
+            self.status.configure(text=self._ready_text())
+            return
+        if len(q) >= self.MIN_QUERY_CHARS:
+            self._debounce_id = self.root.after(self.DEBOUNCE_MS, self._on_debounce)
+            self._show_filename_matches(q)
 
-            # 2. De-duplicate: Keep only the best scoring chunk for each file 
-            unique_results = []
-            seen_files = set()
+    def _show_filename_matches(self, query):
+        """Filename hits render on the keystroke itself; content results replace them later."""
+        if self.engine_state != "ready" or not self.vector_search.filename_index.ready.is_set():
+            return
+        matches = self.vector_search.search_filenames(query, limit=self.FILENAME_HITS)
+        if matches:
+            self._render_results(matches)
+            self.status.configure(text=f"{len(matches)} filename matches · searching contents...")
 
-            for res in raw_results:
-                fname = res.get("filename", "unknown")
-                if fname not in seen_files:
-                    unique_results.append(res)
-                    seen_files.add(fname)
+    def _on_debounce(self):
+        self._debounce_id = None
+        q = self.query.get().strip()
+        if len(q) >= self.MIN_QUERY_CHARS:
+            self._search(q, started=self._keystroke_time)
 
-            # 3. Slice to get the top 10 UNIQUE files 
-            final_results = unique_results[:10]
+    def _cancel_debounce(self):
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+            self._debounce_id = None
 
-            self.root.after(0, lambda: self._render_results(final_results))
+    # -------------------- SEARCH EXECUTION -------------------- 
+    def _search(self, query, started=None):
+        if not self._engine_ready.is_set():
+            # Runs as soon as the engine is loaded (only the latest query is kept) 
+            self._pending_query = query
+            self.status.configure(text="Loading search engine... your search will run when it is ready.")
+            return
+        if self.engine_state != "ready":
+            self.status.configure(text="Search engine failed to load. See console for details.")
+            return
 
-        threading.Thread(target=task, daemon=True).start()
+        self.status.configure(text="Searching...")
+        self.search_worker.submit(query, started or time.perf_counter())
+
+    def _run_search(self, query):
+        """Runs on the search worker thread."""
+        # 1. Fetch more results than needed (e.g., 50) to allow for filtering 
+        raw_results = self.vector_search.search(query, top_k=50)
+
+        # 2. De-duplicate: Keep only the best scoring chunk for each file 
+        unique_results = []
+        seen_files = set()
+
+        for res in raw_results:
+            fname = res.get("filename", "unknown")
+            if fname not in seen_files:
+                unique_results.append(res)
+                seen_files.add(fname)
+
+        # 3. Direct file name matches go first (fuzzy ones only fill empty slots) 
+        names = [r for r in self.vector_search.search_filenames(query, limit=self.FILENAME_HITS)
+                 if r["filename"] not in seen_files]
+        strong = [r for r in names if r["match"] != "fuzzy"]
+        weak = [r for r in names if r["match"] == "fuzzy"]
+
+        # 4. Slice to get the top 10 UNIQUE files 
+        return (strong + unique_results + weak)[:10]
+
+    def _on_search_result(self, seq, query, results, started):
+        if self.root:
+            self.root.after(0, lambda: self._apply_search_result(seq, results, started))
+
+    def _apply_search_result(self, seq, results, started):
+        # Superseded while waiting for the UI thread 
+        if seq != self.search_worker.latest_seq:
+            return
+        self._render_results(results)
+
+        latency = time.perf_counter() - started
+        self.search_latencies.append(latency)
+        if results:
+            self.status.configure(text=f"Showing {len(results[:10])} results ({latency * 1000:.0f} ms)")
 
     # -------------------- RENDER RESULTS -------------------- 
     def _build_results(self):
@@ -297,9 +481,15 @@ class SearchWindow:
         body = ctk.CTkFrame(frame, fg_color="transparent")
         body.pack(side="left", fill="x", expand=True, pady=8)
 
+        title = res.get("filename", "Unknown")
+        page_start = res.get("metadata", {}).get("page_start")
+        if page_start:
+            page_end = res["metadata"].get("page_end", page_start)
+            title += f"  ·  p. {page_start}" if page_end == page_start else f"  ·  pp. {page_start}-{page_end}"
+
         ctk.CTkLabel(
             body,
-            text=res.get("filename", "Unknown"),
+            text=title,
             font=("Segoe UI", 14, "bold"),
             text_color=THEME["accent"],
             anchor="w"
@@ -434,76 +624,112 @@ class SearchWindow:
         folder = filedialog.askdirectory()
         if not folder:
             return
+        self._start_indexing(os.path.abspath(folder))
+
+    def _start_indexing(self, folder):
+        if self.engine_state != "ready":
+            self.status.configure(text="Search engine is still loading, try again in a moment.")
+            return
+        if self._indexing:
+            self.status.configure(text="Indexing already in progress.")
+            return
+        self._indexing = True
         self.status.pack_forget()
         self.progress_donut.pack(side="left", padx=10)
         self.progress_donut.set(0)
         threading.Thread(target=self._index_thread, args=(folder,), daemon=True).start()
 
+    def _resume_interrupted_jobs(self):
+        manifest = self.vector_search.manifest
+        for job in manifest.interrupted_jobs():
+            if not os.path.isdir(job["root"]):
+                manifest.finish_job(job["id"], status="failed")
+            elif job["root"] not in self._resume_queue:
+                print(f"Resuming interrupted indexing of {job['root']} ({job['files_done']} files already done)")
+                self._resume_queue.append(job["root"])
+        self._resume_next()
+
+    def _resume_next(self):
+        """Start the next queued resume; called again when each indexing run ends."""
+        if self._closing or self._indexing or not self._resume_queue:
+            return
+        self._start_indexing(self._resume_queue.popleft())
+
     def _index_thread(self, folder):
+        manifest = self.vector_search.manifest
+        job = manifest.start_job(folder)
         try:
-            files = self.file_indexer.scan_directory(folder)
-            total = len(files)
-            if total == 0:
-                self.root.after(0, lambda: self.status.configure(text="No supported files found."))
-                self.root.after(1500, self._reset_footer)
-                return
+            # Previous size of this folder; the scan streams, so the total is only an estimate 
+            expected = max(len(manifest.paths_under(folder)), job["files_done"])
+            # The scan stamps every file it finds; rows left unstamped are deleted files 
+            scan_started = time.time()
 
-            existing_ids = self.vector_search.get_all_ids()
-            new_files = []
-            skipped_count = 0
-            self.root.after(0, lambda: self.status.configure(text="Checking file status..."))
-            last_update_pct = 0.0
-
-            for i, f in enumerate(files):
-                try:
-                    stats = os.stat(f)
-                    doc_id = hashlib.md5(f"{f}_{stats.st_mtime}".encode()).hexdigest()
-                    if doc_id in existing_ids:
-                        skipped_count += 1
-                    else:
-                        new_files.append(f)
-
-                    current_progress = (i + 1) / total
-                    if current_progress - last_update_pct >= 0.01:
-                        self.root.after(0, lambda p=current_progress: self.progress_donut.set(p))
-                        last_update_pct = current_progress
-                except Exception:
-                    new_files.append(f)
-
-            final_skipped_pct = skipped_count / total
-            self.root.after(0, lambda: self.progress_donut.set(final_skipped_pct))
-
-            if not new_files:
-                self.root.after(0, lambda: self.progress_donut.set(1.0))
-                self.root.after(0, lambda: self.status.configure(text="All files up to date."))
-                self.root.after(1500, self._reset_footer)
-                return
-
-            self.root.after(0, lambda: self.status.configure(text=f"Indexing {len(new_files)} new files..."))
+            if job["resumed"]:
+                status_text = f"Resuming ({job['files_done']} files already done)..."
+            else:
+                status_text = "Scanning and indexing..."
+            self.root.after(0, lambda: self.status.configure(text=status_text))
 
             def progress_callback(i, name):
-                current_total = skipped_count + i
-                pct = current_total / total
+                counts = self.file_indexer.scan_counts
+                done = counts["skipped"] + i
+                total = max(expected, counts["seen"], 1)
+                pct = min(1.0, done / total)
                 self.root.after(0, lambda: self.progress_donut.set(pct))
+                if i % 100 == 0:
+                    manifest.update_job(job["id"], done)
 
-            gen = self.file_indexer.process_files(new_files, existing_ids=existing_ids)
+            # Files are indexed while the walk is still running 
+            gen = self.file_indexer.process_files(
+                self.file_indexer.scan_directory_iter(folder), manifest=manifest, scheduler=self.scheduler
+            )
             self.vector_search.add_documents(gen, progress_callback=progress_callback)
 
+            if self._closing:
+                # Interrupted: the job stays 'running' and resumes on the next start 
+                counts = self.file_indexer.scan_counts
+                manifest.update_job(job["id"], counts["seen"])
+                return
+
+            # Files deleted or moved since the last scan of this folder. An aborted or 
+            # partial walk never stamped the files it missed, so it cannot tell 
+            if self.file_indexer.last_scan_complete:
+                self.vector_search.remove_unseen(folder, scan_started)
+            self.index_watcher.add_root(folder)
+            manifest.finish_job(job["id"])
+            self.index_health = self.vector_search.index_health()
+
+            indexed = self.file_indexer.scan_counts["seen"] - self.file_indexer.scan_counts["skipped"]
+            if not self.file_indexer.scan_counts["seen"]:
+                message = "No supported files found."
+            elif indexed == 0:
+                message = "All files up to date."
+            else:
+                message = f"Indexed {indexed} new files."
+
             self.root.after(0, lambda: self.progress_donut.set(1.0))
-            self.root.after(0, lambda: self.status.configure(text=f"Indexed {len(new_files)} new files."))
+            self.root.after(0, lambda: self.status.configure(text=message))
 
         except Exception as e:
             print(f"Indexing error: {e}")
+            manifest.finish_job(job["id"], status="failed")
             self.root.after(0, lambda: self.status.configure(text="Error during indexing."))
         finally:
-            self.root.after(2000, self._reset_footer)
+            self._indexing = False
+            if not self._closing:
+                self.root.after(2000, self._reset_footer)
+                self.root.after(0, self._resume_next)
 
     def _reset_footer(self):
+        if self._indexing:
+            return  # The next queued run already owns the progress display 
         self.progress_donut.pack_forget()
         self.status.pack(side="left", pady=5)
 
     def _check_empty_db(self):
         try:
+            if self.engine_state != "ready" or self._indexing or self.vector_search.manifest.interrupted_jobs():
+                return
             if self.vector_search.get_stats()["count"] == 0:
                 if messagebox.askyesno("Welcome", "No documents indexed. Index now?"):
                     self._browse_folder()
@@ -515,6 +741,9 @@ class SearchWindow:
         """ 
         Deletes all indexed data after confirmation. 
         """
+        if self.engine_state != "ready":
+            self.status.configure(text="Search engine is still loading, try again in a moment.")
+            return
         msg = "Are you sure you want to delete all indexed documents?\nThis action cannot be undone."
         if messagebox.askyesno("Reset Index", msg):
             try:
@@ -527,6 +756,8 @@ class SearchWindow:
                 # 2. Call Backend 
                 if hasattr(self.vector_search, 'clear_database'):
                     success = self.vector_search.clear_database()
+                    self.index_watcher.clear_roots()
+                    self.index_health = None
                     if success:
                         self.status.configure(text="Database cleared.")
                         messagebox.showinfo("Success", "All indexed documents have been removed.")
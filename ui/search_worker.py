@@ -0,0 +1,70 @@
+"""
+Search Worker
+One background thread that runs searches for the UI. Only the most recent request
+is kept pending: requests superseded while waiting are never run, and results of a
+request that was superseded while running are dropped.
+"""
+
+import threading
+
+
+class SearchWorker:
+    def __init__(self, search_fn, on_result):
+        """
+        Args:
+            search_fn (callable): query -> results (runs on the worker thread)
+            on_result (callable): (seq, query, results, started) for the latest request only
+        """
+        self.search_fn = search_fn
+        self.on_result = on_result
+
+        self._cond = threading.Condition()
+        self._pending = None
+        self._seq = 0
+        self._stopped = False
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def latest_seq(self):
+        return self._seq
+
+    def submit(self, query, started):
+        """Queue a search, replacing any request that has not started yet. Returns its sequence number."""
+        with self._cond:
+            self._seq += 1
+            self._pending = (self._seq, query, started)
+            self._cond.notify()
+            return self._seq
+
+    def cancel(self):
+        """Drop the pending request and make the results of a running one stale."""
+        with self._cond:
+            self._seq += 1
+            self._pending = None
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                seq, query, started = self._pending
+                self._pending = None
+
+            try:
+                results = self.search_fn(query)
+            except Exception as e:
+                print(f"Search error: {e}")
+                results = []
+
+            # A newer request arrived while this one was running
+            if seq == self._seq:
+                self.on_result(seq, query, results, started)